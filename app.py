@@ -1,25 +1,61 @@
-from flask import Flask, render_template
+from flask import Flask, Request, render_template, jsonify, abort
 from dotenv import load_dotenv
+from io import BytesIO
 import os
 
 from extensions import db, bcrypt, mail, login_manager
+from database.sqlite import SQLITE_ENGINE_OPTIONS, configure_sqlite
 
 # Ensure this is after extensions init
 from database.models import User
+from utils.user_cache import load_cached_user, configure_user_cache, user_cache
+from utils.results_cache import results_cache
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # Cached per worker; changes in any worker flush it (see utils/user_cache.py)
+    return load_cached_user(int(user_id))
 import os
 
 load_dotenv()
 
+class InMemoryUploadRequest(Request):
+    # Keep uploaded files in memory (bounded by MAX_CONTENT_LENGTH) instead of
+    # werkzeug's temp-file spooling, so chat exports never touch disk
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return BytesIO()
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-prod')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///chatwrapped.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = SQLITE_ENGINE_OPTIONS     # see database/sqlite.py
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max upload
 
+# Repeat uploads of the same chat reuse its stats (see utils/upload_cache.py)
+app.config['UPLOAD_CACHE_TTL_HOURS']   = int(os.environ.get('UPLOAD_CACHE_TTL_HOURS', 24 * 7))
+app.config['UPLOAD_CACHE_MAX_ENTRIES'] = int(os.environ.get('UPLOAD_CACHE_MAX_ENTRIES', 1000))
+
+# Uploads bigger than this are analyzed as a background job (see utils/jobs.py)
+app.config['ASYNC_UPLOAD_BYTES'] = int(os.environ.get('ASYNC_UPLOAD_BYTES', 2 * 1024 * 1024))
+
+# Chats over MAX_CONTENT_LENGTH go up in pieces; abandoned ones are swept (see utils/chunked_upload.py)
+app.config['CHUNKED_UPLOAD_MAX_BYTES']     = int(os.environ.get('CHUNKED_UPLOAD_MAX_BYTES', 200 * 1024 * 1024))
+app.config['CHUNKED_UPLOAD_CHUNK_BYTES']   = 4 * 1024 * 1024
+app.config['UPLOAD_SESSION_SWEEP_SECONDS'] = int(os.environ.get('UPLOAD_SESSION_SWEEP_SECONDS', 600))
+
+# Generated slide images: retention, disk budget and sweep interval (see utils/image_storage.py)
+app.config['IMAGE_RETENTION_DAYS']    = int(os.environ.get('IMAGE_RETENTION_DAYS', 30))
+app.config['IMAGE_STORAGE_BUDGET_MB'] = int(os.environ.get('IMAGE_STORAGE_BUDGET_MB', 500))
+app.config['IMAGE_SWEEP_SECONDS']     = int(os.environ.get('IMAGE_SWEEP_SECONDS', 3600))
+
+# /internal/cache-stats exposes per-worker cache counters; off unless set to 1
+app.config['CACHE_STATS_ENABLED'] = os.environ.get('CACHE_STATS_ENABLED', '0') == '1'
+
+# Extra fonts for the slides: regular/bold/emoji.ttf in this folder win (see utils/fonts.py)
+app.config['FONT_DIR'] = os.environ.get('FONT_DIR', os.path.join(app.root_path, 'static', 'fonts'))
+
 # Mail config (for password reset emails)
 app.config['MAIL_SERVER']   = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
 app.config['MAIL_PORT']     = 587
@@ -41,6 +77,7 @@ from routes.analysis  import analysis_bp
 from routes.image_gen import image_gen_bp
 from routes.payment   import payment_bp
 from routes.dashboard import dashboard_bp
+from routes.chunked_upload import chunked_upload_bp
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(upload_bp)
@@ -48,6 +85,7 @@ app.register_blueprint(analysis_bp)
 app.register_blueprint(image_gen_bp)
 app.register_blueprint(payment_bp)
 app.register_blueprint(dashboard_bp)
+app.register_blueprint(chunked_upload_bp)
 
 # Error handlers
 @app.errorhandler(404)
@@ -69,10 +107,34 @@ def refund(): return render_template('legal/refund.html')
 @app.route('/faq')
 def faq(): return render_template('faq.html')
 
+# Hit rates of this worker's caches
+@app.route('/internal/cache-stats')
+def cache_stats():
+    if not app.config['CACHE_STATS_ENABLED']:
+        abort(404)
+    return jsonify({'pid': os.getpid(), 'user_cache': user_cache.info(), 'results_cache': results_cache.info()})
+
 # Create DB tables on first run
 with app.app_context():
-    from database.models import User, Analysis, GeneratedImage, Payment, PasswordReset
+    from database.models import User, Analysis, GeneratedImage, Payment, PasswordReset, UploadCache, AnalysisJob, UploadSession, UserSummary
+    from database.migrations import ensure_columns
+    configure_sqlite(db.engine)
     db.create_all()
+    ensure_columns(db, Analysis, AnalysisJob, UploadCache, GeneratedImage, Payment)
+    from utils.incremental import clear_stale_checkpoints
+    clear_stale_checkpoints(db)
+
+from utils.fonts import configure_fonts
+configure_fonts(app.config['FONT_DIR'])
+
+# Lets one worker's user changes reach the others' user caches
+configure_user_cache(os.path.join(app.instance_path, 'user_cache.stamp'))
+
+from utils.image_storage import start_sweeper
+start_sweeper(app)
+
+from utils import chunked_upload
+chunked_upload.start_sweeper(app)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,27 @@
+"""
+Peak Python heap for parse + stats: MessageTable vs the old list-of-dicts.
+Usage: python benchmarks/bench_memory.py [messages]
+"""
+import os, sys, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_parser import make_chat
+from utils.whatsapp_parser import _parse_lines
+from utils.stats_calculator import calculate_all_stats
+
+def peak_mb(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+if __name__ == '__main__':
+    n     = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    lines = make_chat(n)
+    table = peak_mb(lambda: calculate_all_stats(_parse_lines(lines)))
+    dicts = peak_mb(lambda: calculate_all_stats(list(_parse_lines(lines))))
+    print(f'{n} messages')
+    print(f'  list of dicts  {dicts:8.1f} MB peak')
+    print(f'  MessageTable   {table:8.1f} MB peak')
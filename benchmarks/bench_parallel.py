@@ -0,0 +1,28 @@
+"""
+Single pass vs chunked/parallel analysis (parse + stats) of a synthetic chat.
+Usage: python benchmarks/bench_parallel.py [messages] [workers]
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_parser import make_chat
+from utils.whatsapp_parser import parse_whatsapp_chat
+from utils.stats_calculator import calculate_all_stats, stats_from_partial
+from utils.parallel_stats import analyze_chat
+
+def timed(fn, *args, **kwargs):
+    start  = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+if __name__ == '__main__':
+    n       = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    lines   = make_chat(n)
+    single, secs = timed(lambda: calculate_all_stats(parse_whatsapp_chat(lines)))
+    print(f'single pass       {secs*1000:8.1f} ms')
+    for w in sorted({1, workers}):
+        partial, secs = timed(analyze_chat, lines, workers=w)
+        assert stats_from_partial(partial) == single
+        print(f'chunked {w:2d} worker(s) {secs*1000:8.1f} ms')
@@ -0,0 +1,92 @@
+"""
+Parser throughput benchmark.
+Usage: python benchmarks/bench_parser.py [messages]
+"""
+import os, sys, time, random
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import emoji as emoji_lib
+from utils.whatsapp_parser import _parse_lines, extract_emojis, TARGET_MSGS_PER_SEC
+from utils.system_messages import DEFAULT_CLASSIFIER
+
+# Speedup over the per-code-point emoji lookup the request asked for
+EMOJI_TARGET_SPEEDUP = 10
+
+# The substring list the parser used to scan every line with
+OLD_SKIP_PHRASES = [
+    'Messages and calls are end-to-end encrypted', 'changed their phone number',
+    'added you', 'left', 'created group', '<Media omitted>', 'null',
+    'image omitted', 'video omitted', 'audio omitted', 'sticker omitted',
+]
+
+WORDS = ('hello sorry haha gm good morning kya kar rahe ho lol okay yaar bhai '
+         'movie chalein kal milte hain nahi 😂 ❤️ 👍🏽').split()
+
+def make_chat(n, fmt='android', seed=42):
+    """Synthetic two-person export with n message lines"""
+    rnd   = random.Random(seed)
+    t     = datetime(2021, 1, 1, 8, 0)
+    lines = []
+    for _ in range(n):
+        t     += timedelta(seconds=rnd.choice([5, 30, 120, 600, 3600, 20000, 90000]))
+        sender = rnd.choice(['Rahul', 'Priya'])
+        text   = ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(1, 12)))
+        if fmt == 'android':
+            lines.append(f"{t.strftime('%m/%d/%Y')}, {t.strftime('%I:%M %p')} - {sender}: {text}")
+        else:
+            lines.append(f"[{t.strftime('%m/%d/%y')}, {t.strftime('%I:%M:%S %p')}] {sender}: {text}")
+    return lines
+
+def bench_parse(lines, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start    = time.perf_counter()
+        messages = _parse_lines(lines)
+        best     = min(best, time.perf_counter() - start)
+    return len(messages), best
+
+def bench_classifier(lines):
+    """ns per line: combined matcher on the body vs substring scan of the line"""
+    bodies   = [line.split(': ', 1)[1] for line in lines]
+    classify = DEFAULT_CLASSIFIER.classify
+    start = time.perf_counter()
+    for body in bodies:
+        classify(body)
+    new = time.perf_counter() - start
+    start = time.perf_counter()
+    for line in lines:
+        any(skip in line for skip in OLD_SKIP_PHRASES)
+    old = time.perf_counter() - start
+    return new / len(lines) * 1e9, old / len(lines) * 1e9
+
+def bench_emojis(texts):
+    """Seconds for the trie/regex scanner vs the old per-code-point lookup"""
+    extract_emojis('😂')            # build the index outside the timing
+    start = time.perf_counter()
+    for text in texts:
+        extract_emojis(text)
+    new = time.perf_counter() - start
+    start = time.perf_counter()
+    for text in texts:
+        [c for c in text if c in emoji_lib.EMOJI_DATA]
+    old = time.perf_counter() - start
+    return new, old
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    for fmt in ('android', 'iphone'):
+        count, secs = bench_parse(make_chat(n, fmt))
+        rate = count / secs
+        print(f'{fmt:8s} {count:>8d} msgs  {secs*1000:8.1f} ms  {rate:>10,.0f} msg/s  '
+              f'(target {TARGET_MSGS_PER_SEC:,} msg/s: {"ok" if rate >= TARGET_MSGS_PER_SEC else "below"})')
+    new_ns, old_ns = bench_classifier(make_chat(n))
+    print(f'system-message filter: {new_ns:.0f} ns/line (substring scan: {old_ns:.0f} ns/line)')
+    texts = [line.split(': ', 1)[1] for line in make_chat(n)]
+    # Everyday mix: one message in five carries emoji, the rest is plain text
+    plain = [t if i % 5 == 0 else t.encode('ascii', 'ignore').decode() for i, t in enumerate(texts)]
+    for label, sample in (('emoji-heavy', texts), ('everyday', plain)):
+        new, old = bench_emojis(sample)
+        print(f'emoji scan ({label}): {new*1000:.0f} ms vs {old*1000:.0f} ms per-code-point ({old/new:.1f}x, '
+              f'target {EMOJI_TARGET_SPEEDUP}x: {"ok" if old/new >= EMOJI_TARGET_SPEEDUP else "below"})')
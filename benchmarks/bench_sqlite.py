@@ -0,0 +1,85 @@
+"""
+Concurrent write throughput on one SQLite file, stock settings vs the
+pragmas in database/sqlite.py. Writer processes (like gunicorn workers)
+commit small analysis-sized rows while a reader process keeps running
+the dashboard query; reports commits/s, reads/s and lock errors.
+Usage: python benchmarks/bench_sqlite.py [writers] [commits_per_writer]
+"""
+import os, sys, time, tempfile, multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from database.sqlite import SQLITE_ENGINE_OPTIONS, configure_sqlite
+
+ROW = os.urandom(900)       # about one compact results blob
+
+def engine_for(path, tuned):
+    if tuned:
+        engine = create_engine(f'sqlite:///{path}', **SQLITE_ENGINE_OPTIONS)
+        configure_sqlite(engine)
+    else:
+        engine = create_engine(f'sqlite:///{path}')
+    return engine
+
+def setup(path, tuned):
+    with engine_for(path, tuned).begin() as conn:
+        conn.execute(text('CREATE TABLE analyses (id INTEGER PRIMARY KEY, user_id INTEGER, '
+                          'created_at REAL, results_blob BLOB)'))
+        conn.execute(text('CREATE INDEX ix_analyses_user_id_created_at ON analyses (user_id, created_at)'))
+
+def writer(path, tuned, commits, worker_id, out):
+    engine = engine_for(path, tuned)
+    errors = 0
+    for i in range(commits):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text('INSERT INTO analyses (user_id, created_at, results_blob) VALUES (:u, :t, :b)'),
+                             {'u': (worker_id * commits + i) % 50, 't': time.time(), 'b': ROW})
+        except OperationalError:            # database is locked
+            errors += 1
+    out.put(errors)
+
+def reader(path, tuned, stop, out):
+    engine = engine_for(path, tuned)
+    reads  = errors = 0
+    while not stop.is_set():
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT id FROM analyses WHERE user_id = :u '
+                                  'ORDER BY created_at DESC LIMIT 3'), {'u': reads % 50}).all()
+            reads += 1
+        except OperationalError:
+            errors += 1
+    out.put((reads, errors))
+
+def run(tuned, writers, commits):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        setup(path, tuned)
+        ctx   = multiprocessing.get_context('spawn')
+        out   = ctx.Queue()
+        stop  = ctx.Event()
+        rproc = ctx.Process(target=reader, args=(path, tuned, stop, out))
+        rproc.start()
+        procs = [ctx.Process(target=writer, args=(path, tuned, commits, w, out)) for w in range(writers)]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        write_errors = sum(out.get() for _ in procs)
+        elapsed = time.perf_counter() - start
+        stop.set()
+        reads, read_errors = out.get()
+        for p in procs + [rproc]:
+            p.join()
+    done = writers * commits - write_errors
+    print(f"{'tuned' if tuned else 'stock':<6} {done / elapsed:>10,.0f} commits/s {reads / elapsed:>10,.0f} reads/s"
+          f"   lock errors: {write_errors} writes, {read_errors} reads")
+
+if __name__ == '__main__':
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    commits = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    print(f'{writers} writer processes x {commits} commits, 1 reader')
+    run(False, writers, commits)
+    run(True, writers, commits)
@@ -0,0 +1,27 @@
+"""
+calculate_all_stats timing on a synthetic chat.
+Usage: python benchmarks/bench_stats.py [messages]
+"""
+import os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_parser import make_chat
+from utils.whatsapp_parser import _parse_lines
+from utils.stats_calculator import calculate_all_stats
+from utils.stats_numpy import HAVE_NUMPY
+
+def bench_stats(table, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        calculate_all_stats(table, **kwargs)
+        best  = min(best, time.perf_counter() - start)
+    return best
+
+if __name__ == '__main__':
+    n     = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    table = _parse_lines(make_chat(n))
+    for backend in ('python', 'numpy') if HAVE_NUMPY else ('python',):
+        secs = bench_stats(table, backend=backend)
+        print(f'{backend:7s} {len(table)} messages  {secs*1000:8.1f} ms  {len(table)/secs:>10,.0f} msg/s')
@@ -0,0 +1,52 @@
+"""
+Word/emoji counting: exact Counters vs HeavyHitters summaries, on a chat
+with a long-tailed (Zipf-like) vocabulary. Reports heap peak of the
+counting state, time, whether the top-10 words agree and the worst
+observed undercount against the N/(k+1) bound.
+Usage: python benchmarks/bench_topk.py [messages]
+"""
+import os, sys, time, random, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.message_table import MessageTable
+from utils.stats_engine import Emojis, Vocabulary, run_metrics
+from utils.stats_calculator import STOPWORDS, KEYWORD_FAMILIES, TOPK_CAPACITY
+from utils.tokenizer import Tokenizer
+
+def make_table(n, seed=7):
+    rnd   = random.Random(seed)
+    table = MessageTable()
+    word  = lambda: 'w' + ''.join(chr(97 + int(c)) for c in str(int(rnd.paretovariate(0.5))))
+    for i in range(n):
+        text = ' '.join(word() for _ in range(rnd.randint(1, 10)))
+        table.append(i * 60, ('Rahul', 'Priya', 'Amit')[i % 3], text + (' 😂' if i % 5 == 0 else ''))
+    return table
+
+def metrics(approx_after):
+    return [Emojis(approx_after=approx_after),
+            Vocabulary(Tokenizer(STOPWORDS, KEYWORD_FAMILIES), approx_after=approx_after)]
+
+def run(table, approx_after):
+    start = time.perf_counter()
+    run_metrics(table, metrics(approx_after))
+    secs  = time.perf_counter() - start
+    tracemalloc.start()
+    counted = run_metrics(table, metrics(approx_after))
+    peak    = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return counted[1], secs, peak / 1024 / 1024
+
+if __name__ == '__main__':
+    n     = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    table = make_table(n)
+    exact, secs, mb = run(table, None)
+    print(f'{n} messages, {len(exact.counts):,} distinct words')
+    print(f'  exact    {secs*1000:8.1f} ms  {mb:7.1f} MB peak')
+    approx, secs, mb = run(table, 1)
+    top_exact  = [w for w, c in exact.counts.most_common(10)]
+    top_approx = [w for w, c in approx.counts.most_common(10)]
+    worst = max(exact.counts[w] - c for w, c in approx.counts.counts.items())
+    print(f'  sketch   {secs*1000:8.1f} ms  {mb:7.1f} MB peak  (capacity {TOPK_CAPACITY})')
+    print(f'  top-10 same: {top_exact == top_approx}  worst undercount {worst}'
+          f'  <= error {approx.counts.error} <= N/(k+1) {approx.counts.total() // (TOPK_CAPACITY + 1)}')
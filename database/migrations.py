@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+def ensure_columns(db, *models):
+    """
+    Add columns (and their indexes) that a model gained after its table was
+    created. db.create_all() only creates missing tables; SQLite can ADD
+    COLUMN in place, which is all new nullable/defaulted columns need.
+    Safe to run from several workers at once.
+    """
+    inspector = inspect(db.engine)
+    for model in models:
+        table    = model.__table__
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=db.engine.dialect)
+            _run_once(db, lambda conn: conn.execute(
+                text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}')))
+        for index in table.indexes:
+            _run_once(db, lambda conn: index.create(conn, checkfirst=True))
+
+def _run_once(db, ddl):
+    # Another worker may have run the same DDL between our check and now
+    try:
+        with db.engine.begin() as conn:
+            ddl(conn)
+    except OperationalError as e:
+        if 'duplicate column' not in str(e) and 'already exists' not in str(e):
+            raise
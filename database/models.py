@@ -25,33 +25,51 @@ class Analysis(db.Model):
     id           = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id      = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     chat_name    = db.Column(db.String(200), default='My Chat')
-    results_json = db.Column(db.Text, nullable=False)
+    # Stats, read through utils/results_codec.py; deferred so listing rows
+    # (and cache hits) never load them
+    results_json = db.deferred(db.Column(db.Text, nullable=False))     # legacy plain JSON, '' once migrated
+    results_blob = db.deferred(db.Column(db.LargeBinary, nullable=True))
     file_deleted = db.Column(db.Boolean, default=True)
     created_at   = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at   = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Incremental re-analysis: metrics state + fingerprints of first/last message
+    # (deferred: only a re-upload reads it, and it is far bigger than the stats)
+    checkpoint     = db.deferred(db.Column(db.Text, nullable=True))
+    msg_count      = db.Column(db.Integer, nullable=True)
+    first_msg_hash = db.Column(db.String(32), nullable=True, index=True)
+    last_msg_hash  = db.Column(db.String(32), nullable=True)
     images       = db.relationship('GeneratedImage', backref='analysis', lazy=True)
+    # Dashboard: a user's analyses, newest first
+    __table_args__ = (db.Index('ix_analyses_user_id_created_at', 'user_id', 'created_at'),)
     def __repr__(self): return f'<Analysis {self.id} - {self.chat_name}>'
 
 # TABLE 3: generated_images
 class GeneratedImage(db.Model):
     __tablename__ = 'generated_images'
     id              = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    analysis_id     = db.Column(db.Integer, db.ForeignKey('analyses.id'), nullable=False)
+    analysis_id     = db.Column(db.Integer, db.ForeignKey('analyses.id'), nullable=False, index=True)
     user_id         = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
     template_name   = db.Column(db.String(50), default='dark')
     image_paths_json= db.Column(db.Text)
     is_watermarked  = db.Column(db.Boolean, default=True)
     created_at      = db.Column(db.DateTime, default=datetime.utcnow)
+    # Storage lifecycle (utils/image_storage.py): files are evicted, rows kept
+    bytes_used      = db.Column(db.BigInteger, nullable=True)
+    last_used_at    = db.Column(db.DateTime, nullable=True, index=True)
+    evicted         = db.Column(db.Boolean, default=False)
 
 # TABLE 4: payments
 class Payment(db.Model):
     __tablename__ = 'payments'
     id                  = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id             = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    razorpay_order_id   = db.Column(db.String(100), nullable=False)
+    razorpay_order_id   = db.Column(db.String(100), nullable=False, index=True)
     razorpay_payment_id = db.Column(db.String(100), nullable=True)
     amount              = db.Column(db.Integer, default=4900)
     status              = db.Column(db.String(20), default='created')
     created_at          = db.Column(db.DateTime, default=datetime.utcnow)
+    # Billing history: a user's captured payments, newest first
+    __table_args__ = (db.Index('ix_payments_user_id_status_created_at', 'user_id', 'status', 'created_at'),)
 
 # TABLE 5: password_resets
 class PasswordReset(db.Model):
@@ -61,3 +79,60 @@ class PasswordReset(db.Model):
     token      = db.Column(db.String(255), unique=True, nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
     used       = db.Column(db.Boolean, default=False)
+
+# TABLE 6: upload_cache (stats of recently uploaded chats, by content hash)
+class UploadCache(db.Model):
+    __tablename__ = 'upload_cache'
+    id             = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    content_hash   = db.Column(db.String(40), unique=True, nullable=False)
+    user_id        = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)   # who uploaded it
+    results_json   = db.Column(db.Text, nullable=False)
+    results_blob   = db.Column(db.LargeBinary, nullable=True)
+    checkpoint     = db.Column(db.Text, nullable=True)
+    msg_count      = db.Column(db.Integer, nullable=True)
+    first_msg_hash = db.Column(db.String(32), nullable=True)
+    last_msg_hash  = db.Column(db.String(32), nullable=True)
+    hits           = db.Column(db.Integer, default=0)
+    created_at     = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at   = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# TABLE 7: analysis_jobs (big uploads analyzed in the background)
+class AnalysisJob(db.Model):
+    __tablename__ = 'analysis_jobs'
+    id          = db.Column(db.String(32), primary_key=True)             # uuid4 hex
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    chat_name   = db.Column(db.String(200), default='My Chat')
+    status      = db.Column(db.String(20), default='queued')            # queued/running/done/failed
+    progress    = db.Column(db.Integer, default=0)                      # percent
+    message     = db.Column(db.String(255), nullable=True)              # shown to the user
+    preview     = db.Column(db.Text, nullable=True)                     # JSON, utils/preview.py
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analyses.id'), nullable=True)
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at  = db.Column(db.DateTime, nullable=True)                 # when a thread took it
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow)       # heartbeat while running
+
+# TABLE 8: upload_sessions (resumable chunked uploads, analyzed as chunks arrive)
+class UploadSession(db.Model):
+    __tablename__ = 'upload_sessions'
+    id          = db.Column(db.String(32), primary_key=True)             # uuid4 hex
+    user_id     = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    chat_name   = db.Column(db.String(200), default='My Chat')
+    total_size  = db.Column(db.BigInteger, nullable=True)
+    received    = db.Column(db.BigInteger, default=0)                   # bytes taken so far
+    carry       = db.Column(db.LargeBinary, nullable=True)              # bytes after the last newline
+    chat_format = db.Column(db.String(40), nullable=True)               # JSON [format, dayfirst]
+    state       = db.Column(db.Text, nullable=True)                     # PartialStats state JSON
+    status      = db.Column(db.String(20), default='open')              # open/finalizing/done
+    analysis_id = db.Column(db.Integer, db.ForeignKey('analyses.id'), nullable=True)
+    created_at  = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at  = db.Column(db.DateTime, default=datetime.utcnow)
+
+# TABLE 9: user_summaries (dashboard numbers, refreshed on upload/delete)
+class UserSummary(db.Model):
+    __tablename__ = 'user_summaries'
+    user_id        = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    analyses_count = db.Column(db.Integer, default=0)
+    latest_id      = db.Column(db.Integer, nullable=True)
+    latest_at      = db.Column(db.DateTime, nullable=True)
+    recent_json    = db.Column(db.Text, default='[]')                   # newest few: id, chat_name, created_at, total_messages
+    updated_at     = db.Column(db.DateTime, default=datetime.utcnow)
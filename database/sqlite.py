@@ -0,0 +1,47 @@
+"""
+SQLite tuning for several gunicorn workers sharing one database file.
+
+Every new connection gets SQLITE_PRAGMAS. WAL lets readers (every page
+view) carry on while one writer commits, instead of queueing behind the
+rollback journal's exclusive lock; synchronous=NORMAL is safe in WAL
+mode (a crash can lose the last commits, never corrupt the file) and
+saves an fsync per commit; busy_timeout makes a writer wait for the
+lock rather than fail with "database is locked".
+
+Each worker process has its own small pool: SQLite takes one writer at a
+time anyway, so more connections only add lock contention.
+"""
+import os
+from sqlalchemy import event
+
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous',  'NORMAL'),
+    ('busy_timeout', 10_000),               # ms
+    ('cache_size',   -16_000),              # KiB of page cache per connection
+    ('temp_store',   'MEMORY'),
+    ('mmap_size',    128 * 1024 * 1024),
+)
+
+# Request thread + background job threads; sqlite3's own timeout matches busy_timeout
+SQLITE_ENGINE_OPTIONS = {
+    'pool_size':     5,
+    'max_overflow':  5,
+    'pool_timeout':  30,
+    'connect_args':  {'timeout': 10},
+}
+
+def _set_pragmas(dbapi_conn, connection_record):
+    cursor = dbapi_conn.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def configure_sqlite(engine):
+    """Tune every connection the engine opens from now on (no-op off SQLite)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    event.listen(engine, 'connect', _set_pragmas)
+    # A worker forked after the app opened connections (gunicorn --preload)
+    # must not share them with its parent
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
@@ -5,6 +5,7 @@ from flask_login import login_user, logout_user, login_required, current_user
 from flask_mail import Message
 from database.models import User, PasswordReset
 from extensions import db, bcrypt, mail
+from utils.user_cache import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -133,6 +134,7 @@ def reset_password():
     user.password_hash = bcrypt.generate_password_hash(new_pwd).decode('utf-8')
     pr.used = True
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash('Password update ho gaya! Ab login karo.', 'success')
     return redirect(url_for('auth.login'))
 
@@ -145,5 +147,6 @@ def verify_email():
         user.is_verified = True
         pr.used = True
         db.session.commit()
+        user_cache.invalidate(user.id)
         flash('Email verify ho gaya!', 'success')
     return redirect(url_for('auth.login'))
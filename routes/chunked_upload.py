@@ -0,0 +1,82 @@
+from flask import Blueprint, request, url_for, jsonify, abort, current_app
+from flask_login import current_user
+from database.models import UploadSession, db
+from utils.chat_export import ChatExportError
+from utils.chunked_upload import start_session, add_chunk, finalize, OffsetMismatch, SessionBusy
+
+chunked_upload_bp = Blueprint('chunked_upload', __name__, url_prefix='/api/uploads')
+
+def _current_user_id():
+    return current_user.id if current_user.is_authenticated else None
+
+def _get_session_or_404(session_id):
+    session = db.get_or_404(UploadSession, session_id)
+    if session.user_id != _current_user_id():
+        abort(404)
+    return session
+
+def _session_state(session):
+    return {
+        'id':          session.id,
+        'offset':      session.received or 0,
+        'size':        session.total_size,
+        'status':      session.status,
+        'analysis_id': session.analysis_id,
+    }
+
+def _conflict(e):
+    # Client is out of step - it resends from the offset we actually have
+    return jsonify({'error': 'Offset match nahi hua', 'offset': e.offset}), 409
+
+@chunked_upload_bp.route('', methods=['POST'])
+def create_session():
+    data      = request.get_json(silent=True) or {}
+    chat_name = (data.get('chat_name') or 'My Chat')[:200]
+    size      = data.get('size')
+    if size is not None and (not isinstance(size, int) or size < 0):
+        return jsonify({'error': 'size galat hai'}), 400
+    try:
+        session = start_session(_current_user_id(), chat_name, size,
+                                current_app.config['CHUNKED_UPLOAD_MAX_BYTES'])
+    except ChatExportError as e:
+        return jsonify({'error': str(e)}), 413
+    state = _session_state(session)
+    state['chunk_size'] = current_app.config['CHUNKED_UPLOAD_CHUNK_BYTES']
+    return jsonify(state), 201
+
+@chunked_upload_bp.route('/<session_id>', methods=['GET'])
+def session_status(session_id):
+    return jsonify(_session_state(_get_session_or_404(session_id)))
+
+@chunked_upload_bp.route('/<session_id>', methods=['PUT'])
+def upload_chunk(session_id):
+    session = _get_session_or_404(session_id)
+    offset  = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'offset chahiye'}), 400
+    try:
+        received = add_chunk(session, offset, request.get_data(cache=False),
+                             current_app.config['CHUNKED_UPLOAD_MAX_BYTES'])
+    except OffsetMismatch as e:
+        return _conflict(e)
+    except ChatExportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'id': session_id, 'offset': received})
+
+@chunked_upload_bp.route('/<session_id>/finalize', methods=['POST'])
+def finalize_session(session_id):
+    session = _get_session_or_404(session_id)
+    try:
+        analysis = finalize(session)
+    except OffsetMismatch as e:
+        return _conflict(e)
+    except SessionBusy:
+        return jsonify({'error': 'Upload abhi finish ho raha hai', 'status': 'finalizing'}), 409
+    except ChatExportError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'analysis_id': analysis.id,
+        'redirect':    url_for('analysis.show_results', analysis_id=analysis.id),
+    })
@@ -1,30 +1,48 @@
 import json
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
-from database.models import Analysis, GeneratedImage, Payment, User, db
+from database.models import Analysis, AnalysisJob, GeneratedImage, Payment, UploadSession, User, db
 from datetime import datetime
+from utils.results_cache import results_cache
+from utils.user_cache import user_cache
+from utils.user_summary import get_summary, recent_analyses, delete_summary
+from utils.pagination import analyses_page
+from utils.image_storage import delete_sets
+from utils.upload_cache import delete_user_entries
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 @dashboard_bp.route('/dashboard')
 @login_required
 def index():
-    analyses_count = Analysis.query.filter_by(user_id=current_user.id).count()
-    last_analysis  = Analysis.query.filter_by(
-        user_id=current_user.id).order_by(Analysis.created_at.desc()).first()
-    recent = Analysis.query.filter_by(
-        user_id=current_user.id).order_by(Analysis.created_at.desc()).limit(3).all()
+    summary = get_summary(current_user.id)
     return render_template('dashboard/index.html',
-        analyses_count=analyses_count, last_analysis=last_analysis, recent=recent)
+        analyses_count=summary.analyses_count, last_analysis_at=summary.latest_at,
+        recent=recent_analyses(summary))
 
 @dashboard_bp.route('/dashboard/analyses')
 @login_required
 def analyses():
-    page = request.args.get('page', 1, type=int)
-    all_analyses = Analysis.query.filter_by(
-        user_id=current_user.id).order_by(
-        Analysis.created_at.desc()).paginate(page=page, per_page=10)
-    return render_template('dashboard/analyses.html', analyses=all_analyses)
+    page = analyses_page(current_user.id, before=request.args.get('before'), after=request.args.get('after'))
+    return render_template('dashboard/analyses.html', analyses=page)
+
+@dashboard_bp.route('/api/analyses')
+@login_required
+def analyses_json():
+    per_page = max(1, min(request.args.get('limit', 20, type=int), 100))
+    page = analyses_page(current_user.id, before=request.args.get('before'),
+                         after=request.args.get('after'), per_page=per_page)
+    return jsonify({
+        'items': [{
+            'id':         a.id,
+            'chat_name':  a.chat_name,
+            'created_at': a.created_at.isoformat(),
+            'messages':   a.msg_count,
+            'url':        url_for('analysis.show_results', analysis_id=a.id),
+        } for a in page.items],
+        'before': page.before,
+        'after':  page.after,
+    })
 
 @dashboard_bp.route('/dashboard/settings', methods=['GET','POST'])
 @login_required
@@ -34,6 +52,7 @@ def settings():
         if action == 'update_profile':
             current_user.name = request.form.get('name', current_user.name).strip()[:100]
             db.session.commit()
+            user_cache.invalidate(current_user.id)
             flash('Profile update ho gaya!', 'success')
     return render_template('dashboard/settings.html')
 
@@ -43,10 +62,20 @@ def delete_account():
     confirm = request.form.get('confirm_text','')
     if confirm == 'DELETE':
         # Delete all user data
+        analysis_ids = [a.id for a in Analysis.query.with_entities(Analysis.id).filter_by(user_id=current_user.id)]
+        delete_sets(GeneratedImage.query.filter(db.or_(GeneratedImage.analysis_id.in_(analysis_ids),
+                                                       GeneratedImage.user_id == current_user.id)).all())
+        # Jobs, upload sessions and cached stats hold chat data too
+        AnalysisJob.query.filter_by(user_id=current_user.id).delete()
+        UploadSession.query.filter_by(user_id=current_user.id).delete()
+        delete_user_entries(current_user.id)
         Analysis.query.filter_by(user_id=current_user.id).delete()
+        delete_summary(current_user.id)
         Payment.query.filter_by(user_id=current_user.id).delete()
         User.query.filter_by(id=current_user.id).delete()
         db.session.commit()
+        results_cache.invalidate(*analysis_ids)
+        user_cache.invalidate(current_user.id)
         flash('Account delete ho gaya.', 'success')
         return redirect(url_for('upload.handle_upload'))
     flash('Type DELETE to confirm!', 'error')
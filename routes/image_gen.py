@@ -4,7 +4,8 @@ from flask_login import current_user
 from PIL import Image
 from database.models import Analysis, GeneratedImage
 from extensions import db
-from utils.image_builder import generate_all_slides
+from utils.results_codec import load_results
+from utils.image_storage import render_set, ensure_files, record_usage
 
 image_gen_bp = Blueprint('image_gen', __name__)
 
@@ -18,31 +19,29 @@ def generate_images():
     
     analysis = Analysis.query.get_or_404(analysis_id)
     try:
-        stats = json.loads(analysis.results_json)
+        stats = load_results(analysis)
     except:
         return "Error parsing stats", 500
     
     is_premium  = current_user.is_authenticated and current_user.is_premium
-    user_id_val = current_user.id if current_user.is_authenticated else 0
-    
-    # Generate 6 slides using Pillow (no API!)
-    # Ensure utils.image_builder.generate_all_slides exists and accepts these args
-    try:
-        image_paths = generate_all_slides(
-            stats, template_name, user_id_val, analysis.id, is_premium
-        )
-    except Exception as e:
-        print(f"Error generating slides: {e}")
-        return f"Error generating slides: {e}", 500
     
     gen_img = GeneratedImage(
         analysis_id      = analysis.id,
-        user_id          = user_id_val if current_user.is_authenticated else None,
+        user_id          = current_user.id if current_user.is_authenticated else None,
         template_name    = template_name,
-        image_paths_json = json.dumps(image_paths),
+        image_paths_json = '[]',
         is_watermarked   = not is_premium
     )
     db.session.add(gen_img)
+    db.session.flush()      # the set id names its files
+    
+    # Generate 6 slides using Pillow (no API!)
+    try:
+        render_set(gen_img, stats)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error generating slides: {e}")
+        return f"Error generating slides: {e}", 500
     db.session.commit()
     
     return redirect(url_for('image_gen.preview_images', image_set_id=gen_img.id))
@@ -50,6 +49,9 @@ def generate_images():
 @image_gen_bp.route('/preview/<int:image_set_id>')
 def preview_images(image_set_id):
     gen_img = GeneratedImage.query.get_or_404(image_set_id)
+    # Evicted sets are drawn again here
+    if not ensure_files(gen_img):
+        abort(404)
     paths   = json.loads(gen_img.image_paths_json)
     # Convert file paths to URL paths relative to static
     # Assuming paths stored are like 'static/generated/...' or just filenames?
@@ -78,6 +80,8 @@ def download_image(image_set_id, platform):
     if platform not in SIZES: abort(404)
     
     gen_img = GeneratedImage.query.get_or_404(image_set_id)
+    if not ensure_files(gen_img):
+        abort(404)
     paths   = json.loads(gen_img.image_paths_json)
     
     # Use slide 1 (overview) for download, resize to platform size
@@ -107,6 +111,8 @@ def download_image(image_set_id, platform):
         output_filename = f'download_{image_set_id}_{platform}.png'
         output_path = os.path.join(output_dir, output_filename)
         img.save(output_path)
+        record_usage(gen_img)
+        db.session.commit()
         
         return send_file(output_path, as_attachment=True,
                         download_name=f'chatwrapped_{platform}.png')
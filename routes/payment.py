@@ -4,6 +4,7 @@ from flask import Blueprint, request, redirect, url_for, render_template, jsonif
 from flask_login import login_required, current_user
 import razorpay
 from database.models import Payment, User, db
+from utils.user_cache import user_cache
 
 payment_bp = Blueprint('payment', __name__)
 
@@ -71,6 +72,7 @@ def verify_payment():
         current_user.is_premium = True
         current_user.premium_at = datetime.utcnow()
         db.session.commit()
+        user_cache.invalidate(current_user.id)
         return redirect(url_for('payment.payment_success'))
     else:
         return redirect(url_for('payment.payment_failed'))
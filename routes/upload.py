@@ -1,16 +1,14 @@
-import os, uuid, json
-from flask import Blueprint, request, redirect, url_for, flash, render_template
+from flask import Blueprint, request, redirect, url_for, flash, render_template, jsonify, abort, current_app
 from flask_login import current_user
-from werkzeug.utils import secure_filename
-from database.models import Analysis, db
-from utils.whatsapp_parser import parse_whatsapp_chat
-from utils.stats_calculator import calculate_all_stats
+from database.models import AnalysisJob, db
+from utils.chat_export import ChatExportError, chat_text_size
+from utils.upload_pipeline import process_upload
+from utils.jobs import submit_analysis, job_state
+from utils.preview import preview_stats
 
 upload_bp = Blueprint('upload', __name__)
 
-ALLOWED_EXTENSIONS = {'txt'}
-UPLOAD_FOLDER = 'uploads'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+ALLOWED_EXTENSIONS = {'txt', 'zip'}
 
 @upload_bp.route('/upload', methods=['GET', 'POST'])
 def handle_upload():
@@ -27,8 +25,8 @@ def handle_upload():
         flash('No file selected', 'error')
         return redirect(url_for('upload.handle_upload'))
         
-    if not file.filename.lower().endswith('.txt'):
-        flash('Sirf .txt file allowed hai', 'error')
+    if file.filename.rsplit('.', 1)[-1].lower() not in ALLOWED_EXTENSIONS:
+        flash('Sirf .txt ya .zip file allowed hai', 'error')
         return redirect(url_for('upload.handle_upload'))
     
     chat_name = request.form.get('chat_name', 'My Chat')
@@ -36,52 +34,68 @@ def handle_upload():
         chat_name = 'My Chat'
     chat_name = chat_name[:200]
     
-    # Save temporarily with unique name
-    unique_name = str(uuid.uuid4()) + '.txt'
-    file_path = os.path.join(UPLOAD_FOLDER, unique_name)
+    user_id = current_user.id if current_user.is_authenticated else None
+    
+    # Big chats are analyzed in the background; the browser polls the job
+    # and shows sampled preview stats until the exact ones are ready. A zip
+    # is sized by the chat inside it - that is what gets parsed.
+    if chat_text_size(file) > current_app.config['ASYNC_UPLOAD_BYTES']:
+        # A preview is optional: if it fails, the job still runs and reports
+        # what is wrong with the file
+        try:
+            preview = preview_stats(file.stream)
+        except Exception as e:
+            preview = None
+            file.stream.seek(0)
+            if not isinstance(e, ChatExportError):
+                print(f"Preview error: {e}") # For debugging
+        job = submit_analysis(current_app._get_current_object(), file.stream.read(), user_id, chat_name, preview)
+        return redirect(url_for('upload.job_page', job_id=job.id))
     
     try:
-        file.save(file_path)
-        
-        # Parse and analyze
-        parsed_messages = parse_whatsapp_chat(file_path)
-        
-        if len(parsed_messages) < 10:
-            os.remove(file_path)
-            flash('Chat file mein bahut kam messages hain ya format galat hai.', 'error')
-            return redirect(url_for('upload.handle_upload'))
-        
-        stats = calculate_all_stats(parsed_messages)
-        
-        # Save to database
-        user_id = current_user.id if current_user.is_authenticated else None
-        
-        # Convert stats to JSON string
-        results_json_str = json.dumps(stats, default=str)
-        
-        analysis = Analysis(
-            user_id      = user_id,
-            chat_name    = chat_name,
-            results_json = results_json_str,
-            file_deleted = True
-        )
-        
-        db.session.add(analysis)
-        db.session.commit()
-        
-        # Clean up file immediately
-        if os.path.exists(file_path):
-            os.remove(file_path)
-            
+        analysis, note = process_upload(file, user_id, chat_name)
+        if note:
+            flash(note, 'success')
         return redirect(url_for('analysis.show_results', analysis_id=analysis.id))
         
+    except ChatExportError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('upload.handle_upload'))
     except Exception as e:
-        if os.path.exists(file_path):
-            os.remove(file_path)
         flash(f'Error analyzing chat: {str(e)}', 'error')
         print(f"Error: {e}") # For debugging
         return redirect(url_for('upload.handle_upload'))
 
+def _get_job_or_404(job_id):
+    job = db.get_or_404(AnalysisJob, job_id)
+    if job.user_id is not None and (not current_user.is_authenticated or current_user.id != job.user_id):
+        abort(404)
+    return job
+
+@upload_bp.route('/jobs/<job_id>')
+def job_page(job_id):
+    job = _get_job_or_404(job_id)
+    return render_template('processing.html', job=job, preview=job_state(job)['preview'])
+
+@upload_bp.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    state = job_state(_get_job_or_404(job_id))
+    if state['status'] == 'done':
+        state['redirect'] = url_for('upload.job_done', job_id=job_id)
+    return jsonify(state)
+
+@upload_bp.route('/jobs/<job_id>/done')
+def job_done(job_id):
+    job = _get_job_or_404(job_id)
+    if job.status == 'failed':
+        flash(job.message or 'Error analyzing chat', 'error')
+        return redirect(url_for('upload.handle_upload'))
+    if job.status != 'done':
+        return redirect(url_for('upload.job_page', job_id=job_id))
+    if job.message:
+        flash(job.message, 'success')
+    return redirect(url_for('analysis.show_results', analysis_id=job.analysis_id))
+
 @upload_bp.route('/error/invalid')
 def invalid_file():
     return render_template('errors/invalid-file.html'), 400
@@ -0,0 +1,107 @@
+import os, zipfile, zlib
+from contextlib import contextmanager
+
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Upper bound on the decompressed chat text pulled out of a .zip export
+# (uploads are capped at 10MB; chat text compresses about 6x)
+MAX_CHAT_BYTES = 64 * 1024 * 1024
+
+# A "line" longer than this is not a chat export
+MAX_LINE_BYTES = 1024 * 1024
+
+class ChatExportError(ValueError):
+    """Upload is not a usable WhatsApp export"""
+
+def is_zip_export(file):
+    """True if the upload (FileStorage or binary stream) is a zip archive"""
+    stream = getattr(file, 'stream', file)
+    pos    = stream.tell()
+    magic  = stream.read(len(ZIP_MAGIC))
+    stream.seek(pos)
+    return magic == ZIP_MAGIC
+
+def find_chat_member(infos):
+    """
+    Pick the chat text out of a zip export's members.
+    iPhone exports use '_chat.txt', Android 'WhatsApp Chat with <name>.txt';
+    otherwise fall back to the largest .txt file. Media is never looked at.
+    """
+    texts = [i for i in infos if not i.is_dir() and i.filename.lower().endswith('.txt')]
+    for info in texts:
+        if os.path.basename(info.filename) == '_chat.txt':
+            return info
+    for info in texts:
+        if os.path.basename(info.filename).startswith('WhatsApp Chat'):
+            return info
+    return max(texts, key=lambda i: i.file_size, default=None)
+
+# Raised while decompressing a damaged member (bad CRC, truncated data)
+MEMBER_READ_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+
+def chat_text_size(file):
+    """
+    Bytes of chat text an upload holds: the chat member's uncompressed size
+    for a .zip export (the stream size if the archive can't be read), the
+    stream size otherwise. Leaves the stream rewound.
+    """
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    size = stream.seek(0, 2)
+    stream.seek(0)
+    if is_zip_export(stream):
+        try:
+            with zipfile.ZipFile(stream) as archive:
+                info = find_chat_member(archive.infolist())
+            if info is not None:
+                size = info.file_size
+        except zipfile.BadZipFile:
+            pass
+        stream.seek(0)
+    return size
+
+def _limited_lines(member, limit):
+    # readline() with a cap, so a member without newlines is never
+    # decompressed into memory in one piece
+    read = 0
+    try:
+        while True:
+            line = member.readline(MAX_LINE_BYTES + 1)
+            if not line:
+                break
+            if len(line) > MAX_LINE_BYTES:
+                raise ChatExportError('Ye WhatsApp chat export nahi lagti.')
+            read += len(line)
+            if read > limit:
+                raise ChatExportError('Zip ke andar chat file bahut badi hai.')
+            yield line
+    except MEMBER_READ_ERRORS:
+        raise ChatExportError('Zip file kharab hai ya poori upload nahi hui.')
+
+@contextmanager
+def open_chat_export(file):
+    """
+    Yield the chat's lines from an upload, .txt or .zip.
+    For a zip, only the chat text member is decompressed, line by line,
+    straight from the archive - nothing is extracted to disk.
+    """
+    stream = getattr(file, 'stream', file)
+    if not is_zip_export(stream):
+        yield stream
+        return
+    try:
+        archive = zipfile.ZipFile(stream)
+    except zipfile.BadZipFile:
+        raise ChatExportError('Zip file kharab hai ya poori upload nahi hui.')
+    with archive:
+        info = find_chat_member(archive.infolist())
+        if info is None:
+            raise ChatExportError('Zip mein koi chat .txt file nahi mili.')
+        if info.file_size > MAX_CHAT_BYTES:
+            raise ChatExportError('Zip ke andar chat file bahut badi hai.')
+        try:
+            member = archive.open(info)
+        except (RuntimeError, NotImplementedError):    # encrypted / unsupported compression
+            raise ChatExportError('Ye zip file open nahi ho saki.')
+        with member:
+            yield _limited_lines(member, MAX_CHAT_BYTES)
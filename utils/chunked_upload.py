@@ -0,0 +1,170 @@
+"""
+Resumable chunked uploads for chats bigger than MAX_CONTENT_LENGTH.
+
+start -> add_chunk(offset, bytes) ... -> finalize. Each chunk is cut into
+whole lines (the bytes after the last newline wait for the next chunk),
+parsed with the format detected from the first chunk, run through the
+metrics and merged into the session's PartialStats state - so by the time
+the last chunk lands the analysis is nearly done. Everything lives in the
+upload_sessions row: any gunicorn worker can take the next chunk, and a
+client that lost a response asks for the offset and resends from there.
+Only plain .txt exports can be streamed (a zip's index sits at its end).
+
+Until it is finalized, a session row holds chat data: the partial last
+line and the merged stats state. finalize() clears both, and a sweeper
+thread deletes sessions untouched for SESSION_TTL, so an abandoned upload
+does not sit in the database.
+"""
+import json, threading, time, uuid
+from datetime import datetime, timedelta
+from database.models import Analysis, UploadSession, db
+from utils.chat_export import ZIP_MAGIC, MAX_LINE_BYTES, ChatExportError
+from utils.whatsapp_parser import detect_lines_format
+from utils.stats_calculator import default_metrics, stats_from_partial
+from utils.parallel_stats import analyze_chunk
+from utils.stats_engine import PartialStats
+from utils.incremental import save_checkpoint
+from utils.results_codec import store_results
+from utils.user_summary import refresh_summary
+from utils.upload_pipeline import MIN_MESSAGES
+from utils.jobs import prune_jobs
+
+SESSION_TTL = timedelta(hours=24)
+
+# Default cap on a session's total bytes (the app passes CHUNKED_UPLOAD_MAX_BYTES)
+MAX_SESSION_BYTES = 200 * 1024 * 1024
+
+class SessionBusy(Exception):
+    """Another request is finalizing the session right now"""
+
+class OffsetMismatch(Exception):
+    """Chunk does not start where the session is; .offset is where it is"""
+    def __init__(self, offset):
+        super().__init__(f'expected offset {offset}')
+        self.offset = offset
+
+def start_session(user_id, chat_name, total_size=None, max_bytes=MAX_SESSION_BYTES):
+    if total_size is not None and total_size > max_bytes:
+        raise ChatExportError('File bahut badi hai.')
+    expire_sessions()           # in case the sweeper is off
+    session = UploadSession(id=uuid.uuid4().hex, user_id=user_id, chat_name=chat_name,
+                            total_size=total_size, received=0)
+    db.session.add(session)
+    db.session.commit()
+    return session
+
+def _analyze_lines(session, lines):
+    # Parse whole lines and merge their stats into the session's state
+    lines = [line.decode('utf-8', errors='ignore') for line in lines]
+    if session.chat_format is None:
+        lines[0] = lines[0].lstrip('\ufeff')
+        session.chat_format = json.dumps(detect_lines_format(lines))
+    chunk = analyze_chunk(lines, tuple(json.loads(session.chat_format)))
+    if session.state is None:
+        return chunk
+    return PartialStats.from_state(json.loads(session.state), default_metrics()).merge(chunk)
+
+def add_chunk(session, offset, data, max_bytes=MAX_SESSION_BYTES):
+    """Take the bytes at offset; returns the new offset"""
+    if session.status != 'open':
+        raise ChatExportError('Ye upload pehle hi finish ho chuka hai.')
+    if offset != session.received:
+        raise OffsetMismatch(session.received)
+    if offset + len(data) > max_bytes:
+        raise ChatExportError('File bahut badi hai.')
+    if offset == 0 and data.startswith(ZIP_MAGIC):
+        raise ChatExportError('Badi files ke liye .txt export upload karo, .zip nahi.')
+
+    lines = ((session.carry or b'') + data).split(b'\n')
+    carry = lines.pop()
+    if len(carry) > MAX_LINE_BYTES:
+        raise ChatExportError('Ye WhatsApp chat export nahi lagti.')
+    if lines:
+        session.state = json.dumps(_analyze_lines(session, lines).to_state(),
+                                   ensure_ascii=False, separators=(',', ':'))
+    # Only move on if no other request took this offset (or finalized) meanwhile
+    claimed = (UploadSession.query
+               .filter_by(id=session.id, received=offset, status='open')
+               .update({'received':    offset + len(data),
+                        'carry':       carry,
+                        'chat_format': session.chat_format,
+                        'state':       session.state,
+                        'updated_at':  datetime.utcnow()}))
+    if not claimed:
+        db.session.rollback()
+        current = db.session.get(UploadSession, session.id)
+        if current.status != 'open':
+            raise ChatExportError('Ye upload pehle hi finish ho chuka hai.')
+        raise OffsetMismatch(current.received)
+    db.session.commit()
+    return offset + len(data)
+
+def finalize(session):
+    """Analyze the last partial line and save the Analysis; safe to repeat"""
+    if session.status == 'done':
+        return db.session.get(Analysis, session.analysis_id)
+    if session.total_size is not None and session.received != session.total_size:
+        raise OffsetMismatch(session.received)
+
+    # Claim the session, so two finalize requests can't both save an Analysis
+    claimed = (UploadSession.query
+               .filter_by(id=session.id, status='open')
+               .update({'status': 'finalizing', 'updated_at': datetime.utcnow()}))
+    db.session.commit()
+    if not claimed:
+        db.session.refresh(session)
+        if session.status == 'done':
+            return db.session.get(Analysis, session.analysis_id)
+        raise SessionBusy()
+
+    try:
+        partial = _analyze_lines(session, [session.carry]) if session.carry else (
+            PartialStats.from_state(json.loads(session.state), default_metrics()) if session.state else None)
+        if partial is None or partial.messages < MIN_MESSAGES:
+            raise ChatExportError('Chat file mein bahut kam messages hain ya format galat hai.')
+
+        analysis = Analysis(
+            user_id      = session.user_id,
+            chat_name    = session.chat_name,
+            file_deleted = True
+        )
+        store_results(analysis, stats_from_partial(partial))
+        save_checkpoint(analysis, partial)
+        db.session.add(analysis)
+        db.session.flush()
+    except Exception:
+        db.session.rollback()
+        UploadSession.query.filter_by(id=session.id).update({'status': 'open'})
+        db.session.commit()
+        raise
+    session.status      = 'done'
+    session.analysis_id = analysis.id
+    session.carry       = None
+    session.state       = None
+    session.updated_at  = datetime.utcnow()
+    db.session.commit()
+    refresh_summary(session.user_id)
+    return analysis
+
+def expire_sessions(ttl=SESSION_TTL):
+    """Delete sessions untouched for ttl - with any chat data they still hold"""
+    expired = UploadSession.query.filter(UploadSession.updated_at < datetime.utcnow() - ttl).delete()
+    db.session.commit()
+    return expired
+
+def _sweep_forever(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                expire_sessions()
+                prune_jobs()            # ended background jobs, same cadence
+            except Exception as e:
+                db.session.rollback()
+                print(f"Upload session sweep error: {e}") # For debugging
+
+def start_sweeper(app):
+    """Expire sessions and prune ended jobs every UPLOAD_SESSION_SWEEP_SECONDS in a daemon thread (0 = off)"""
+    interval = app.config['UPLOAD_SESSION_SWEEP_SECONDS']
+    if interval > 0:
+        threading.Thread(target=_sweep_forever, args=(app, interval), name='upload-session-sweeper', daemon=True).start()
@@ -0,0 +1,82 @@
+"""
+Fonts for the slide images, resolved once and reused.
+
+At startup the registry picks, per weight ('regular', 'bold', 'emoji'),
+the font files that exist: first regular/bold/emoji.{ttf,otf,ttc} in the
+configured FONT_DIR, then the usual system locations. get() memoizes the
+loaded FreeTypeFont by (size, weight), so a slide set opens each font
+once instead of probing the disk and parsing the file for every line of
+text. The memo is per thread: a FreeTypeFont wraps a FreeType face,
+which must not be used from two threads at once.
+
+A weight whose files are all missing or unloadable falls back to
+regular, and regular to Pillow's built-in font. An emoji font is only
+used for the emoji themselves - it may lack digits and Latin letters.
+"""
+import os, threading
+from PIL import ImageFont
+
+FONT_CANDIDATES = {
+    'regular': [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+        '/System/Library/Fonts/Helvetica.ttc',
+        'C:\\Windows\\Fonts\\arial.ttf',
+        'C:\\Windows\\Fonts\\segoeui.ttf',
+    ],
+    'bold': [
+        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',
+        '/System/Library/Fonts/Helvetica.ttc',
+        'C:\\Windows\\Fonts\\arialbd.ttf',
+        'C:\\Windows\\Fonts\\seguiSB.ttf',
+    ],
+    # Outline (scalable) emoji fonts; bitmap-only color fonts load at fixed sizes only
+    'emoji': [
+        '/usr/share/fonts/truetype/noto/NotoEmoji-Regular.ttf',
+        '/usr/share/fonts/truetype/ancient-scripts/Symbola_hint.ttf',
+        '/usr/share/fonts/truetype/unifont/unifont_upper.ttf',
+        'C:\\Windows\\Fonts\\seguiemj.ttf',
+    ],
+}
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+
+class FontRegistry:
+    def __init__(self, font_dir=None):
+        self.font_dir = font_dir
+        self.paths    = {weight: self._resolve(weight) for weight in FONT_CANDIDATES}
+        self._local   = threading.local()
+
+    def _resolve(self, weight):
+        candidates = []
+        if self.font_dir:
+            candidates += [os.path.join(self.font_dir, weight + ext) for ext in FONT_EXTENSIONS]
+        candidates += FONT_CANDIDATES[weight]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def _load(self, size, weight):
+        for path in self.paths[weight]:
+            try:
+                return ImageFont.truetype(path, size)
+            except OSError:
+                pass
+        if weight != 'regular':
+            return self.get(size, 'regular')
+        return ImageFont.load_default()
+
+    def get(self, size, weight='regular'):
+        fonts = getattr(self._local, 'fonts', None)
+        if fonts is None:
+            fonts = self._local.fonts = {}
+        font = fonts.get((size, weight))
+        if font is None:
+            font = fonts[(size, weight)] = self._load(size, weight)
+        return font
+
+registry = FontRegistry(os.environ.get('FONT_DIR'))
+
+def configure_fonts(font_dir):
+    """Resolve fonts again with a FONT_DIR (called once at startup)"""
+    global registry
+    registry = FontRegistry(font_dir)
+    return registry
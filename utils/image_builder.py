@@ -1,5 +1,6 @@
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from PIL import Image, ImageDraw, ImageFilter
 import os, json
+from utils import fonts
 
 TEMPLATES = {
     'dark':     {'bg':'#1a1a2e', 'text':'#FFFFFF', 'accent':'#25D366', 'sub':'#AAAAAA'},
@@ -16,21 +17,9 @@ def hex_to_rgb(h):
     h = h.lstrip('#')
     return tuple(int(h[i:i+2],16) for i in (0,2,4))
 
-def get_font(size, bold=False):
-    font_paths = [
-        # Linux / standard paths
-        '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf' if bold else '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-        '/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf',         
-        '/System/Library/Fonts/Helvetica.ttc',
-        # Windows paths (common)
-        'C:\\Windows\\Fonts\\arialbd.ttf' if bold else 'C:\\Windows\\Fonts\\arial.ttf',
-        'C:\\Windows\\Fonts\\seguiSB.ttf' if bold else 'C:\\Windows\\Fonts\\segoeui.ttf',
-    ]
-    for fp in font_paths:
-        if os.path.exists(fp):
-            try: return ImageFont.truetype(fp, size)
-            except: pass
-    return ImageFont.load_default()
+def get_font(size, bold=False, emoji=False):
+    # Loaded once per (size, weight) and reused (see utils/fonts.py)
+    return fonts.registry.get(size, 'emoji' if emoji else 'bold' if bold else 'regular')
 
 def draw_text_center(draw, y, text, font, color, width=1080):
     bbox = draw.textbbox((0,0), text, font=font)
@@ -46,7 +35,7 @@ def draw_bar(draw, x, y, val, max_val, bar_w, bar_h, color):
     if filled > 0:
         draw.rectangle([x, y, x+filled, y+bar_h], fill=hex_to_rgb(color))
 
-def generate_all_slides(stats, template_name, user_id, analysis_id, is_premium=False):
+def generate_all_slides(stats, template_name, user_id, analysis_id, is_premium=False, image_set_id=None):
     colors = TEMPLATES.get(template_name, TEMPLATES['dark'])
     paths  = []
     
@@ -71,7 +60,9 @@ def generate_all_slides(stats, template_name, user_id, analysis_id, is_premium=F
         logo_font = get_font(20)
         draw.text((SLIDE_SIZE[0]-200, 20), 'ChatWrapped.in', font=logo_font, fill=hex_to_rgb(colors['accent']))
         
-        filename = f'{user_id}_{analysis_id}_slide{i}.png'
+        # Named per image set, so each set owns its files (see utils/image_storage.py)
+        set_part = f'_{image_set_id}' if image_set_id is not None else ''
+        filename = f'{user_id}_{analysis_id}{set_part}_slide{i}.png'
         path = os.path.join(OUTPUT_DIR, filename)
         # Using absolute path for safety/consistency if needed, but relative usually fine for web serving
         # However, Flask usually serves from static folder.
@@ -137,10 +128,15 @@ def _slide_emojis(draw, img, s, c):
     draw_text_center(draw, 120, f'Total: {s.get("total_emojis", 0)} emojis used!', get_font(28), hex_to_rgb(c['sub']))
     top5 = s.get('top5_emojis', [])
     y = 220
+    # Emoji font (if one was found) for the emoji only - it may have no
+    # digits - and the regular font for the count, centred as one line
+    emoji_font, count_font = get_font(56, emoji=True), get_font(56)
     for item in top5[:5]:
-        emoji_text = f'{item["emoji"]}  x{item["count"]}'
-        # Ensure emoji rendering (might fail on some fonts but we hope fallback works)
-        draw_text_center(draw, y, emoji_text, get_font(56), hex_to_rgb(c['text']))
+        emoji_text, count_text = item['emoji'], f'  x{item["count"]}'
+        emoji_w = draw.textlength(emoji_text, font=emoji_font)
+        x = (1080 - emoji_w - draw.textlength(count_text, font=count_font)) // 2
+        draw.text((x, y), emoji_text, font=emoji_font, fill=hex_to_rgb(c['text']))
+        draw.text((x + emoji_w, y), count_text, font=count_font, fill=hex_to_rgb(c['text']))
         y += 120
 
 def _slide_fun_facts(draw, img, s, c):
@@ -0,0 +1,169 @@
+"""
+Lifecycle of the slide PNGs under static/generated.
+
+Each GeneratedImage set owns its files (slides named after the set id,
+plus the resized downloads) and records the bytes they take and when
+they were last viewed. The sweeper, a daemon thread in every worker:
+
+  - evicts sets not viewed for IMAGE_RETENTION_DAYS, then the least
+    recently used ones until the total is within IMAGE_STORAGE_BUDGET_MB;
+  - deletes sets whose analysis is gone, and files no set owns, at most
+    SWEEP_BATCH per run so a big backlog never stalls a worker.
+
+Eviction only deletes files; the row stays, and ensure_files() renders
+the slides again from the analysis the next time the set is opened.
+Every step tolerates another worker deleting the same file first.
+"""
+import glob, json, os, threading, time
+from datetime import datetime, timedelta
+from flask import current_app
+from database.models import Analysis, GeneratedImage, db
+from utils.image_builder import OUTPUT_DIR, generate_all_slides
+from utils.results_codec import load_results
+
+SWEEP_BATCH = 500
+
+# Files younger than this may belong to a set still being written
+ORPHAN_GRACE = timedelta(minutes=10)
+
+def _slide_paths(image_set):
+    return [os.path.join(OUTPUT_DIR, os.path.basename(p)) for p in json.loads(image_set.image_paths_json or '[]')]
+
+def _download_paths(image_set):
+    # Platform-sized copies of slide 1, written by the download route
+    return [p for p in glob.glob(os.path.join(OUTPUT_DIR, f'download_{image_set.id}_*.png')) if os.path.exists(p)]
+
+def set_files(image_set):
+    """Paths of the files a set owns that exist on disk"""
+    downloads = _download_paths(image_set)
+    return [p for p in _slide_paths(image_set) if os.path.exists(p)] + downloads
+
+def _remove(path):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+def record_usage(image_set):
+    """Recount a set's bytes and mark it used now (caller commits)"""
+    image_set.bytes_used   = sum(os.path.getsize(p) for p in set_files(image_set))
+    image_set.last_used_at = datetime.utcnow()
+    image_set.evicted      = False
+
+def render_set(image_set, stats):
+    """Draw a set's slides into its own files and record them (caller commits)"""
+    paths = generate_all_slides(stats, image_set.template_name, image_set.user_id or 0,
+                                image_set.analysis_id, not image_set.is_watermarked, image_set.id)
+    image_set.image_paths_json = json.dumps(paths)
+    record_usage(image_set)
+
+def _slides_on_disk(image_set):
+    slides = _slide_paths(image_set)
+    return bool(slides) and all(os.path.exists(p) for p in slides)
+
+def ensure_files(image_set):
+    """
+    Make sure every one of a set's slides is on disk - rendering them again
+    if it was evicted or any is missing - and mark it used. Returns False
+    if its analysis is gone. Downloads are resized from the slides on each
+    request, so a missing one is not rendered here; a re-render drops the
+    old ones, which were cut from the previous slides.
+    """
+    if image_set.evicted or not _slides_on_disk(image_set):
+        analysis = db.session.get(Analysis, image_set.analysis_id)
+        if analysis is None:
+            return False
+        for path in _download_paths(image_set):
+            _remove(path)
+        render_set(image_set, load_results(analysis))
+    else:
+        image_set.last_used_at = datetime.utcnow()
+    db.session.commit()
+    return True
+
+def evict(image_set):
+    """Delete a set's files, keep its row (caller commits); returns bytes freed"""
+    freed = sum(_remove(p) for p in set_files(image_set))
+    image_set.bytes_used = 0
+    image_set.evicted    = True
+    return freed
+
+def delete_sets(image_sets):
+    """Delete sets' files and rows (caller commits)"""
+    for image_set in image_sets:
+        evict(image_set)
+        db.session.delete(image_set)
+
+def enforce_budget(retention_days=None, budget_bytes=None):
+    """Evict expired sets, then LRU sets over the byte budget; returns sets evicted"""
+    config = current_app.config
+    retention_days = retention_days if retention_days is not None else config['IMAGE_RETENTION_DAYS']
+    budget_bytes   = budget_bytes if budget_bytes is not None else config['IMAGE_STORAGE_BUDGET_MB'] * 1024 * 1024
+    live    = GeneratedImage.query.filter(GeneratedImage.evicted.isnot(True))
+    cutoff  = datetime.utcnow() - timedelta(days=retention_days)
+    evicted = 0
+    # Sets made before usage was tracked: count them, dated by creation
+    for image_set in live.filter(GeneratedImage.bytes_used.is_(None)).limit(SWEEP_BATCH):
+        image_set.bytes_used   = sum(os.path.getsize(p) for p in set_files(image_set))
+        image_set.last_used_at = image_set.created_at
+    for image_set in live.filter(GeneratedImage.last_used_at < cutoff).limit(SWEEP_BATCH):
+        evict(image_set)
+        evicted += 1
+    db.session.flush()
+
+    used = db.session.query(db.func.coalesce(db.func.sum(GeneratedImage.bytes_used), 0)).scalar()
+    if used > budget_bytes:
+        for image_set in live.order_by(GeneratedImage.last_used_at.asc()).limit(SWEEP_BATCH):
+            used    -= evict(image_set)
+            evicted += 1
+            if used <= budget_bytes:
+                break
+    db.session.commit()
+    return evicted
+
+def sweep_orphans(batch=SWEEP_BATCH):
+    """Delete sets whose analysis is gone, then unowned files; returns files removed"""
+    orphan_sets = (GeneratedImage.query
+                   .outerjoin(Analysis, GeneratedImage.analysis_id == Analysis.id)
+                   .filter(Analysis.id.is_(None))
+                   .limit(batch).all())
+    delete_sets(orphan_sets)
+    db.session.commit()
+
+    owned, live_ids = set(), set()
+    for set_id, paths_json in (db.session.query(GeneratedImage.id, GeneratedImage.image_paths_json)
+                               .filter(GeneratedImage.evicted.isnot(True))):
+        live_ids.add(str(set_id))
+        owned.update(os.path.basename(p) for p in json.loads(paths_json or '[]'))
+    grace   = time.time() - ORPHAN_GRACE.total_seconds()
+    removed = 0
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if removed >= batch:
+                break
+            name = entry.name
+            if not name.endswith('.png') or name in owned or entry.stat().st_mtime >= grace:
+                continue
+            if name.startswith('download_') and name.split('_')[1] in live_ids:
+                continue
+            removed += _remove(entry.path) > 0
+    return removed
+
+def _sweep_forever(app, interval):
+    while True:
+        time.sleep(interval)
+        with app.app_context():
+            try:
+                enforce_budget()
+                sweep_orphans()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Image sweep error: {e}") # For debugging
+
+def start_sweeper(app):
+    """Run the sweeper every IMAGE_SWEEP_SECONDS in a daemon thread (0 = off)"""
+    interval = app.config['IMAGE_SWEEP_SECONDS']
+    if interval > 0:
+        threading.Thread(target=_sweep_forever, args=(app, interval), name='image-sweeper', daemon=True).start()
@@ -0,0 +1,92 @@
+"""
+Incremental re-analysis of re-uploaded chats.
+
+An Analysis keeps a checkpoint of its metrics (PartialStats.to_state()), its
+message count and fingerprints of its first and last messages. A newer export
+of the same chat starts with the same messages: when the upload's first
+message and its message number msg_count match the stored fingerprints, only
+the messages after them are run through the metrics and merged into the
+checkpoint.
+
+Only an owner can re-upload into an analysis, so anonymous ones keep no
+checkpoint. The state holds hashes of the first and last messages and the
+50-character preview of the longest, never their full text.
+"""
+import hashlib, json
+from itertools import chain, islice
+from database.models import Analysis, UploadCache
+from utils.whatsapp_parser import (
+    FORMAT_SAMPLE_LINES, iter_chat_lines, parse_whatsapp_chat, detect_lines_format,
+)
+from utils.stats_calculator import default_metrics
+from utils.stats_engine import DateRange, PartialStats, STATE_VERSION, text_digest
+from utils.parallel_stats import analyze_chat
+
+def message_fingerprint(ts, sender, text):
+    # Over the text's digest, so a checkpoint (which keeps only that) can be fingerprinted
+    data = f'{ts}\x1f{sender}\x1f{text_digest(text)}'.encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def row_fingerprint(table, i):
+    return message_fingerprint(table.timestamps[i], table.senders[table.sender_ids[i]], table.texts[i])
+
+def partial_fingerprints(partial):
+    """(first, last) message fingerprints of an analyzed chat"""
+    dates = partial.find(DateRange)
+    return tuple(message_fingerprint(ts, partial.senders[sid], text)
+                 for ts, sid, text in (dates.first, dates.last))
+
+def save_checkpoint(analysis, partial):
+    """Store partial's fingerprints on an Analysis row, and its state if the row has an owner"""
+    if analysis.user_id is not None:
+        analysis.checkpoint = json.dumps(partial.to_state(), ensure_ascii=False, separators=(',', ':'))
+    analysis.msg_count  = partial.messages
+    analysis.first_msg_hash, analysis.last_msg_hash = partial_fingerprints(partial)
+
+def resume_analysis(analysis, table, backend=None):
+    """
+    analysis's checkpoint merged with the messages of table that come after
+    it, or None when table does not extend the stored chat or the
+    checkpoint can't be loaded.
+    """
+    n = analysis.msg_count or 0
+    if not n or len(table) < n or row_fingerprint(table, n - 1) != analysis.last_msg_hash:
+        return None
+    try:
+        base = PartialStats.from_state(json.loads(analysis.checkpoint), default_metrics(backend))
+    except (ValueError, KeyError, TypeError):
+        return None
+    return base.merge(PartialStats.from_table(table.tail(n), default_metrics(backend)))
+
+def analyze_or_resume(source, find_base, backend=None):
+    """
+    Analyze an upload, resuming from a stored analysis when it extends one.
+    find_base(first_fingerprint) -> Analysis with a checkpoint, or None.
+    Returns: (merged PartialStats, the Analysis it extends or None)
+    """
+    lines       = iter_chat_lines(source)
+    head        = list(islice(lines, FORMAT_SAMPLE_LINES))
+    chat_format = detect_lines_format(head)
+    head_table  = parse_whatsapp_chat(head, chat_format=chat_format)
+    base        = find_base(row_fingerprint(head_table, 0)) if len(head_table) else None
+    if base is None:
+        return analyze_chat(chain(head, lines), backend=backend), None
+
+    table   = parse_whatsapp_chat(chain(head, lines), chat_format=chat_format)
+    partial = resume_analysis(base, table, backend)
+    if partial is None:                 # same opening, different history
+        return PartialStats.from_table(table, default_metrics(backend)), None
+    return partial, base
+
+def clear_stale_checkpoints(db):
+    """
+    Drop checkpoints no upload can resume from any more - saved by an older
+    STATE_VERSION (which also kept message text) or on anonymous analyses.
+    Run once at startup.
+    """
+    current = f'{{"version":{STATE_VERSION},%'
+    Analysis.query.filter(Analysis.checkpoint.isnot(None),
+                          db.or_(Analysis.user_id.is_(None), Analysis.checkpoint.notlike(current))
+                          ).update({'checkpoint': None}, synchronize_session=False)
+    UploadCache.query.filter(UploadCache.checkpoint.notlike(current)).update({'checkpoint': None}, synchronize_session=False)
+    db.session.commit()
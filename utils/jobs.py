@@ -0,0 +1,100 @@
+"""
+Background analysis jobs.
+
+Big uploads are analyzed off the request: the route records an AnalysisJob
+row - in SQLite, so whichever gunicorn worker gets a status poll can answer
+it - and hands the upload bytes to a small in-process thread pool. The job
+runs the usual upload pipeline inside an app context and writes progress,
+then the analysis id (or the error), back to the row. The upload stays in
+memory only, and the preview is dropped from the row once the job ends.
+A thread starts a job only by claiming it while it is still queued. A
+running job whose process died stops heartbeating and is reported as
+failed JOB_STALE_SECONDS after its last heartbeat; a queued one just
+waits for a free thread. Ended jobs are pruned after JOB_RETENTION_HOURS.
+"""
+import json, os, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from io import BytesIO
+from database.models import AnalysisJob, db
+from utils.chat_export import ChatExportError
+from utils.upload_pipeline import process_upload
+
+JOB_WORKERS         = int(os.environ.get('JOB_WORKERS', 2))
+JOB_STALE_SECONDS   = int(os.environ.get('JOB_STALE_SECONDS', 300))
+JOB_RETENTION_HOURS = int(os.environ.get('JOB_RETENTION_HOURS', 24))
+
+# Seconds between progress writes to the jobs table
+PROGRESS_INTERVAL = 1.0
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='analysis-job')
+
+def submit_analysis(app, data, user_id, chat_name, preview=None):
+    """Queue the analysis of an upload's bytes; returns the AnalysisJob"""
+    job = AnalysisJob(id=uuid.uuid4().hex, user_id=user_id, chat_name=chat_name,
+                      preview=json.dumps(preview) if preview else None)
+    db.session.add(job)
+    db.session.commit()
+    _executor.submit(_run, app, job.id, data, user_id, chat_name)
+    return job
+
+def _update(job, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+def _run(app, job_id, data, user_id, chat_name):
+    with app.app_context():
+        # Start only a job nobody else started (or gave up on)
+        now     = datetime.utcnow()
+        claimed = (AnalysisJob.query
+                   .filter_by(id=job_id, status='queued')
+                   .update({'status': 'running', 'progress': 1, 'started_at': now, 'updated_at': now}))
+        db.session.commit()
+        if not claimed:
+            return
+        job = db.session.get(AnalysisJob, job_id)
+        last = [time.monotonic()]
+
+        def progress(fraction):
+            now = time.monotonic()
+            if now - last[0] >= PROGRESS_INTERVAL:
+                last[0] = now
+                _update(job, progress=max(1, min(99, int(fraction * 100))))
+
+        try:
+            analysis, note = process_upload(BytesIO(data), user_id, chat_name, progress)
+        except ChatExportError as e:
+            db.session.rollback()
+            _update(job, status='failed', message=str(e), preview=None)
+        except Exception as e:
+            db.session.rollback()
+            _update(job, status='failed', message=f'Error analyzing chat: {str(e)}', preview=None)
+            print(f"Job {job_id} error: {e}") # For debugging
+        else:
+            _update(job, status='done', progress=100, analysis_id=analysis.id, message=note, preview=None)
+
+def job_state(job):
+    """Status dict for polling; marks a job failed if its worker went silent"""
+    if job.status == 'running':
+        stale_since = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+        if (job.updated_at or job.started_at) < stale_since:
+            _update(job, status='failed', message='Analysis beech mein ruk gaya, file dobara upload karo.', preview=None)
+    return {
+        'id':       job.id,
+        'status':   job.status,
+        'progress': job.progress or 0,
+        'message':  job.message,
+        'preview':  json.loads(job.preview) if job.preview else None,
+    }
+
+def prune_jobs(retention=None):
+    """Delete done/failed jobs older than JOB_RETENTION_HOURS; returns how many"""
+    retention = retention or timedelta(hours=JOB_RETENTION_HOURS)
+    pruned = (AnalysisJob.query
+              .filter(AnalysisJob.status.in_(('done', 'failed')),
+                      AnalysisJob.updated_at < datetime.utcnow() - retention)
+              .delete(synchronize_session=False))
+    db.session.commit()
+    return pruned
@@ -0,0 +1,109 @@
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+
+EPOCH    = datetime(1970, 1, 1)
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+def to_datetime(ts):
+    """Epoch seconds (chat's wall clock, no timezone) -> naive datetime"""
+    return EPOCH + timedelta(seconds=ts)
+
+def to_timestamp(dt):
+    """Naive datetime -> epoch seconds, inverse of to_datetime"""
+    return (dt - EPOCH) // timedelta(seconds=1)
+
+def hour_of(ts):
+    return ts // 3600 % 24
+
+def day_of(ts):
+    """Days since 1970-01-01"""
+    return ts // 86400
+
+def weekday_of(ts):
+    # 1970-01-01 was a Thursday
+    return WEEKDAYS[(ts // 86400 + 3) % 7]
+
+class MessageTable:
+    """
+    Column store for parsed messages.
+    timestamps: epoch seconds (array 'q'), sender_ids: index into senders
+    (array 'I'), texts: list of str. Senders are interned in order of their
+    first message, so sender id 0 is whoever spoke first. skipped counts the
+    system/media/deleted lines the parser dropped, by kind.
+
+    Indexing and iteration yield the same {datetime, sender, text} dicts the
+    parser used to return, built on demand.
+    """
+    __slots__ = ('timestamps', 'sender_ids', 'senders', 'texts', 'skipped', '_sender_index')
+
+    def __init__(self):
+        self.timestamps    = array('q')
+        self.sender_ids    = array('I')
+        self.senders       = []
+        self.texts         = []
+        self.skipped       = Counter()
+        self._sender_index = {}
+
+    @classmethod
+    def from_messages(cls, messages):
+        """Build a table from a list of {datetime, sender, text} dicts"""
+        if isinstance(messages, cls):
+            return messages
+        table = cls()
+        for m in messages:
+            table.append(to_timestamp(m['datetime']), m['sender'], m['text'])
+        return table
+
+    def sender_id(self, sender):
+        sid = self._sender_index.get(sender)
+        if sid is None:
+            sid = self._sender_index[sender] = len(self.senders)
+            self.senders.append(sender)
+        return sid
+
+    def append(self, ts, sender, text):
+        self.timestamps.append(ts)
+        self.sender_ids.append(self.sender_id(sender))
+        self.texts.append(text)
+
+    def tail(self, start):
+        """New table of the messages from index start on (senders re-interned)"""
+        table = MessageTable()
+        for ts, sid, text in zip(self.timestamps[start:], self.sender_ids[start:], self.texts[start:]):
+            table.append(ts, self.senders[sid], text)
+        return table
+
+    def rows(self):
+        """Iterate (timestamp, sender_id, text) tuples without building dicts"""
+        return zip(self.timestamps, self.sender_ids, self.texts)
+
+    def datetime_at(self, i):
+        return to_datetime(self.timestamps[i])
+
+    def _row(self, i):
+        return {
+            'datetime': to_datetime(self.timestamps[i]),
+            'sender':   self.senders[self.sender_ids[i]],
+            'text':     self.texts[i],
+        }
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('message index out of range')
+        return self._row(i)
+
+    def __iter__(self):
+        senders = self.senders
+        for ts, sid, text in self.rows():
+            yield {'datetime': to_datetime(ts), 'sender': senders[sid], 'text': text}
+
+    def __repr__(self):
+        return f'<MessageTable {len(self)} messages, {len(self.senders)} senders>'
@@ -0,0 +1,69 @@
+"""
+Keyset (cursor) pagination for a user's analyses, newest first.
+
+A page is the rows strictly older (or newer) than a cursor on
+(created_at, id) - a range scan on ix_analyses_user_id_created_at (SQLite
+keeps the rowid in every index, so id rides along) - instead of OFFSET,
+which reads and throws away every earlier row, plus the COUNT that
+paginate() runs. Page cost stays flat however many analyses a user has.
+Only the listing columns are loaded; the stats blobs are never touched.
+"""
+import base64
+from datetime import datetime
+from database.models import Analysis, db
+
+LIST_COLUMNS = (Analysis.id, Analysis.chat_name, Analysis.created_at, Analysis.msg_count)
+
+class KeysetPage:
+    """items, plus cursors for the next (older) and previous (newer) page or None"""
+    __slots__ = ('items', 'before', 'after')
+
+    def __init__(self, items, before=None, after=None):
+        self.items  = items
+        self.before = before
+        self.after  = after
+
+def encode_cursor(analysis):
+    key = f'{analysis.created_at.isoformat()}|{analysis.id}'
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(created_at, id) from a cursor; None if it is missing or garbled"""
+    if not cursor:
+        return None
+    try:
+        created_at, analysis_id = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split('|')
+        return datetime.fromisoformat(created_at), int(analysis_id)
+    except ValueError:
+        return None
+
+def analyses_page(user_id, before=None, after=None, per_page=10):
+    """
+    One page of the user's analyses, newest first.
+    before: cursor - rows older than it (the next page)
+    after:  cursor - rows newer than it (the previous page)
+    """
+    key   = db.tuple_(Analysis.created_at, Analysis.id)
+    query = (Analysis.query
+             .filter(Analysis.user_id == user_id)
+             .options(db.load_only(*LIST_COLUMNS)))
+    newer = decode_cursor(after)
+    older = decode_cursor(before)
+    if newer is not None:
+        rows = (query.filter(key > newer)
+                .order_by(Analysis.created_at.asc(), Analysis.id.asc())
+                .limit(per_page + 1).all())
+        more_newer, more_older = len(rows) > per_page, True
+        rows = rows[:per_page][::-1]
+    else:
+        if older is not None:
+            query = query.filter(key < older)
+        rows = (query.order_by(Analysis.created_at.desc(), Analysis.id.desc())
+                .limit(per_page + 1).all())
+        more_newer, more_older = older is not None, len(rows) > per_page
+        rows = rows[:per_page]
+    return KeysetPage(
+        items  = rows,
+        before = encode_cursor(rows[-1]) if rows and more_older else None,
+        after  = encode_cursor(rows[0]) if rows and more_newer else None,
+    )
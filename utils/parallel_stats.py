@@ -0,0 +1,110 @@
+"""
+Chunked, parallel chat analysis.
+
+Lines are cut into fixed-size ranges as they stream in. Each range is parsed
+and run through the metrics in a worker process, and the per-range
+PartialStats are merged back in order. A message is one line, so cutting
+between lines never splits one, and the merged stats are exactly what
+calculate_all_stats gives for the whole chat. Small chats (one range), and
+hosts with one CPU - where a pool only adds pickling and process switches -
+run in-process.
+
+Each process keeps one pool, started on first use and shared by every
+upload it handles (request threads and background jobs alike), so
+concurrent uploads queue for the same PARALLEL_WORKERS processes instead
+of each forking its own set.
+"""
+import os, threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain, islice
+from utils.whatsapp_parser import iter_chat_lines, parse_whatsapp_chat, detect_lines_format
+from utils.stats_calculator import default_metrics, resolve_backend
+from utils.stats_engine import PartialStats
+
+# Lines per range, and worker processes per app process (0 = one per CPU)
+PARALLEL_CHUNK_LINES = int(os.environ.get('PARALLEL_CHUNK_LINES', 50_000))
+PARALLEL_WORKERS     = int(os.environ.get('PARALLEL_WORKERS', 0))
+
+# Pools are also started from background job threads, where fork() is unsafe
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_pools     = {}             # this process's pools, by worker count
+_pool_lock = threading.Lock()
+
+def _reset_pools():
+    # A forked child must not use its parent's pools
+    _pools.clear()
+
+os.register_at_fork(after_in_child=_reset_pools)
+
+def _get_pool(workers):
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD))
+        return pool
+
+def _drop_pool(workers, pool):
+    with _pool_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def default_workers():
+    return PARALLEL_WORKERS or os.cpu_count() or 1
+
+def analyze_chunk(lines, chat_format, backend=None):
+    """Parse one range of lines with the chat's format and run the metrics on it"""
+    table = parse_whatsapp_chat(lines, chat_format=chat_format)
+    return PartialStats.from_table(table, default_metrics(backend))
+
+def _chunks(lines, size):
+    while True:
+        chunk = list(islice(lines, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _merge(merged, partial):
+    return partial if merged is None else merged.merge(partial)
+
+def analyze_chat(source, workers=None, chunk_lines=None, backend=None):
+    """
+    source: anything parse_whatsapp_chat accepts.
+    Returns: merged PartialStats (stats_from_partial() turns it into the
+    stats dict, .messages is the message count).
+    """
+    chunk_lines = chunk_lines or PARALLEL_CHUNK_LINES
+    workers     = workers or default_workers()
+    backend     = resolve_backend(backend)
+    chunks      = _chunks(iter_chat_lines(source), chunk_lines)
+    first       = next(chunks, [])
+    chat_format = detect_lines_format(first)
+    if len(first) < chunk_lines or workers == 1:
+        merged = analyze_chunk(first, chat_format, backend)
+        for chunk in chunks:            # empty unless workers == 1
+            merged.merge(analyze_chunk(chunk, chat_format, backend))
+        return merged
+
+    # Keep a bounded number of ranges in flight; merge strictly in order
+    merged  = None
+    pool    = _get_pool(workers)
+    pending = deque()
+    try:
+        for chunk in chain([first], chunks):
+            pending.append(pool.submit(analyze_chunk, chunk, chat_format, backend))
+            if len(pending) >= 2 * workers:
+                merged = _merge(merged, pending.popleft().result())
+        while pending:
+            merged = _merge(merged, pending.popleft().result())
+    except BrokenProcessPool:
+        _drop_pool(workers, pool)       # a worker died; the next upload gets a new pool
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+    return merged
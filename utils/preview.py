@@ -0,0 +1,124 @@
+"""
+Rough stats for a big upload in well under a second, shown while the exact
+analysis runs in the background.
+
+One pass over the raw lines keeps a uniform reservoir sample plus the
+lines at the head and the tail. Only those lines go through the parser's
+patterns: the sample estimates the message count, each sender's share
+and the peak hour; the head and tail give the date range exactly. Every
+estimate carries a confidence label ('high' / 'medium' / 'low') from
+its 95% margin of error, so the page can say how rough it is.
+"""
+import math, random
+from collections import Counter, deque
+from utils.chat_export import open_chat_export
+from utils.message_table import to_datetime, hour_of
+from utils.whatsapp_parser import FORMAT_SAMPLE_LINES, iter_chat_lines, detect_lines_format, parse_whatsapp_chat
+
+SAMPLE_LINES = 4000
+EDGE_LINES   = 50           # head/tail lines searched for the first/last message
+MAX_SENDERS  = 10
+
+Z_95 = 1.96
+
+def reservoir_sample(items, k, rng=random):
+    """
+    Uniform sample of k items from an iterable of unknown length
+    (Vitter's Algorithm R). Returns: (sample, number of items seen)
+    """
+    sample = []
+    n      = 0
+    for n, item in enumerate(items, 1):
+        if n <= k:
+            sample.append(item)
+        else:
+            j = rng.randrange(n)
+            if j < k:
+                sample[j] = item
+    return sample, n
+
+def _label(relative_margin):
+    if relative_margin <= 0.05:
+        return 'high'
+    if relative_margin <= 0.15:
+        return 'medium'
+    return 'low'
+
+def _proportion_margin(hits, n):
+    # 95% margin of a proportion estimated from n draws
+    p = hits / n
+    return Z_95 * math.sqrt(p * (1 - p) / n)
+
+def preview_stats(file, sample_lines=SAMPLE_LINES, rng=random):
+    """
+    file: .txt/.zip upload stream (rewound afterwards).
+    Returns: preview dict, or None if no message turned up in the sample.
+    """
+    stream = getattr(file, 'stream', file)
+    stream.seek(0)
+    head = []
+    tail = deque(maxlen=EDGE_LINES)
+
+    def watch(lines):
+        for line in lines:
+            if len(head) < max(EDGE_LINES, FORMAT_SAMPLE_LINES):
+                head.append(line)
+            tail.append(line)
+            yield line
+
+    try:
+        with open_chat_export(stream) as chat_lines:
+            sample, n = reservoir_sample(watch(iter_chat_lines(chat_lines)), sample_lines, rng)
+    finally:
+        stream.seek(0)
+
+    chat_format = detect_lines_format(head)
+    table = parse_whatsapp_chat(sample, chat_format=chat_format)
+    edges = (parse_whatsapp_chat(head[:EDGE_LINES], chat_format=chat_format).timestamps
+             + parse_whatsapp_chat(tail, chat_format=chat_format).timestamps)
+    if not len(table) or not edges:
+        return None
+
+    # A chat shorter than the sample was read in full - nothing is estimated
+    exact = len(sample) == n
+    k     = len(sample)
+    m     = len(table)
+    count_margin = 0 if exact else _proportion_margin(m, k) * n
+    estimate     = round(m / k * n)
+
+    sender_rows = []
+    for sid, hits in Counter(table.sender_ids).most_common(MAX_SENDERS):
+        margin = 0 if exact else _proportion_margin(hits, m)
+        sender_rows.append({
+            'name':       table.senders[sid],
+            'share':      round(100 * hits / m, 1),
+            'margin':     round(100 * margin, 1),
+            'confidence': _label(margin / (hits / m)),
+        })
+
+    # Peak hour: how clearly does the top hour beat the runner-up?
+    hours = Counter(map(hour_of, table.timestamps)).most_common(2)
+    top   = hours[0][1]
+    runner_up = hours[1][1] if len(hours) > 1 else 0
+    z = (top - runner_up) / math.sqrt(top + runner_up)
+    peak_confidence = 'high' if exact or z >= 2.5 else 'medium' if z >= 1.5 else 'low'
+
+    start_dt = to_datetime(edges[0])
+    end_dt   = to_datetime(edges[-1])
+    return {
+        'sample_size': k,
+        'lines':       n,
+        'messages':    {
+            'value':      estimate,
+            'margin':     round(count_margin),
+            'confidence': 'high' if exact else _label(count_margin / max(estimate, 1)),
+        },
+        'senders':     sender_rows,
+        'peak_hour':   {'value': hours[0][0], 'confidence': peak_confidence},
+        # Read off the first and last lines, not estimated
+        'date_range':  {
+            'start':      start_dt.strftime('%d %b %Y'),
+            'end':        end_dt.strftime('%d %b %Y'),
+            'confidence': 'high',
+        },
+    }
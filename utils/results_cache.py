@@ -0,0 +1,62 @@
+"""
+Per-process LRU cache of decoded analysis stats.
+
+Keyed by analysis id; each entry remembers the row's updated_at and only
+counts as a hit while the row still has it, so an analysis updated by
+another gunicorn worker is decoded afresh here. Deletes and updates made
+in this process invalidate explicitly. One lock guards the dict - the
+background job threads share it with request handlers.
+
+Cached stats dicts are shared between requests: treat them as read-only.
+"""
+import os, threading
+from collections import OrderedDict
+
+RESULTS_CACHE_SIZE = int(os.environ.get('RESULTS_CACHE_SIZE', 256))
+
+class ResultsCache:
+    def __init__(self, capacity=RESULTS_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits     = 0
+        self.misses   = 0
+        self._entries = OrderedDict()       # analysis id -> (updated_at, stats)
+        self._lock    = threading.Lock()
+
+    def get(self, analysis_id, updated_at):
+        """Cached stats if the row has not changed since, else None"""
+        with self._lock:
+            entry = self._entries.get(analysis_id)
+            if entry is None or entry[0] != updated_at:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(analysis_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, analysis_id, updated_at, stats):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._entries[analysis_id] = (updated_at, stats)
+            self._entries.move_to_end(analysis_id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *analysis_ids):
+        with self._lock:
+            for analysis_id in analysis_ids:
+                self._entries.pop(analysis_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'size': len(self._entries), 'capacity': self.capacity}
+
+results_cache = ResultsCache()
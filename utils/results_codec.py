@@ -0,0 +1,78 @@
+"""
+Compact storage for an analysis's stats dict.
+
+A results blob is a fixed header followed by the zlib-compressed JSON:
+
+    b'CWR' | version (1 byte) | hot fields (struct HOT_FORMAT) | zlib(JSON)
+
+The hot fields - the headline numbers lists and cards show - are read
+straight out of the header with struct, without inflating or parsing the
+rest. The JSON is the same document results_json used to hold (dumped
+with default=str), so decode_results() gives back exactly what
+json.loads(results_json) did. Rows still holding plain results_json are
+converted the first time they are read. load_results() keeps decoded
+stats in the process's LRU (utils/results_cache.py).
+"""
+import json, struct, zlib
+from database.models import db
+from utils.results_cache import results_cache
+
+MAGIC          = b'CWR'
+FORMAT_VERSION = 1
+
+# Headline numbers kept uncompressed in the header, in struct order
+HOT_FIELDS = ('total_messages', 'total_days', 'longest_streak', 'total_emojis', 'most_active_hour')
+HOT_FORMAT = struct.Struct('<IIIIB')
+HEADER     = struct.Struct('<3sB')
+
+# Bytes to read for decode_headline() (e.g. with SQL substr())
+HEADLINE_SIZE = HEADER.size + HOT_FORMAT.size
+
+def encode_results(stats):
+    hot  = HOT_FORMAT.pack(*(int(stats.get(field) or 0) for field in HOT_FIELDS))
+    body = json.dumps(stats, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(MAGIC, FORMAT_VERSION) + hot + zlib.compress(body, 6)
+
+def _check_header(blob):
+    magic, version = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f'Unknown results format {magic!r} v{version}')
+
+def decode_results(blob):
+    """Full stats dict from a results blob"""
+    _check_header(blob)
+    return json.loads(zlib.decompress(memoryview(blob)[HEADER.size + HOT_FORMAT.size:]))
+
+def decode_headline(blob):
+    """Just the HOT_FIELDS of a results blob, without inflating the body"""
+    _check_header(blob)
+    return dict(zip(HOT_FIELDS, HOT_FORMAT.unpack_from(blob, HEADER.size)))
+
+def store_results(row, stats):
+    """Set an Analysis (or UploadCache entry)'s stats"""
+    row.results_blob = encode_results(stats)
+    row.results_json = ''           # column is NOT NULL in existing databases
+
+def _migrate(row):
+    # Legacy row: move its plain JSON into a blob, once
+    stats = json.loads(row.results_json)
+    store_results(row, stats)
+    db.session.commit()
+    return stats
+
+def load_results(row):
+    """
+    Stats dict of an Analysis (shared via the cache - do not mutate);
+    converts a legacy row on the way
+    """
+    stats = results_cache.get(row.id, row.updated_at)
+    if stats is None:
+        stats = _migrate(row) if row.results_blob is None else decode_results(row.results_blob)
+        results_cache.put(row.id, row.updated_at, stats)
+    return stats
+
+def load_headline(row):
+    """HOT_FIELDS of an Analysis; converts a legacy row on the way"""
+    if row.results_blob is None:
+        _migrate(row)
+    return decode_headline(row.results_blob)
@@ -0,0 +1,99 @@
+"""
+Bounded-memory counting for the top-k stats (words, emojis).
+
+HeavyHitters is a Misra-Gries ("Frequent") summary - the counter-based
+heavy-hitters family Space-Saving belongs to (the two are isomorphic), in
+the form that takes batched updates through Counter.update and merges
+exactly. For a stream of N items and a capacity k:
+
+  - it holds at most 2k counters (pruned back to k when it doubles);
+  - an estimate never overcounts, and undercounts by at most `error`,
+    which never exceeds N / (k + 1);
+  - every item seen more than N / (k + 1) times is still in the summary,
+    so the real top items are found whenever they stand out by that much;
+  - two summaries merge into one for the combined stream with the same
+    bound (Agarwal et al., "Mergeable Summaries", 2012);
+  - total() is exact.
+"""
+import heapq
+from collections import Counter
+
+class HeavyHitters:
+    __slots__ = ('capacity', 'counts', 'n', 'error')
+
+    def __init__(self, capacity, counts=None, n=0, error=0):
+        self.capacity = capacity
+        self.counts   = Counter(counts or {})
+        self.n        = n
+        self.error    = error
+
+    @classmethod
+    def from_counter(cls, counter, capacity):
+        """Summary of everything an exact Counter has counted so far"""
+        sketch = cls(capacity, counter, counter.total())
+        sketch._prune()
+        return sketch
+
+    def update(self, items):
+        """Count a list of items (same call as Counter.update)"""
+        self.counts.update(items)
+        self.n += len(items)
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def merge(self, other):
+        """Absorb another HeavyHitters or an exact Counter"""
+        if isinstance(other, HeavyHitters):
+            self.counts.update(other.counts)
+            self.n     += other.n
+            self.error += other.error
+        else:
+            self.counts.update(other)
+            self.n += other.total()
+        self._prune()
+        return self
+
+    def _prune(self):
+        # Subtract the (k+1)-th largest count from every counter; each prune
+        # removes at least (k+1) * cut from the stream's N, hence the bound
+        if len(self.counts) <= self.capacity:
+            return
+        cut = heapq.nlargest(self.capacity + 1, self.counts.values())[-1]
+        self.error  += cut
+        self.counts  = Counter({item: c - cut for item, c in self.counts.items() if c > cut})
+
+    def most_common(self, n=None):
+        return self.counts.most_common(n)
+
+    def total(self):
+        return self.n
+
+    def __bool__(self):
+        return self.n > 0
+
+    def to_state(self):
+        return {
+            'capacity': self.capacity,
+            'counts':   [[item, c] for item, c in self.counts.items()],
+            'n':        self.n,
+            'error':    self.error,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state['capacity'], {item: c for item, c in state['counts']}, state['n'], state['error'])
+
+    def __repr__(self):
+        return f'<HeavyHitters {len(self.counts)}/{self.capacity} of {self.n}, error <= {self.error}>'
+
+def merge_counts(mine, theirs):
+    """
+    mine absorbs theirs (each a Counter or HeavyHitters); returns the result.
+    Exact + exact stays an exact Counter.
+    """
+    if isinstance(mine, HeavyHitters):
+        return mine.merge(theirs)
+    if isinstance(theirs, HeavyHitters):
+        return HeavyHitters.from_counter(mine, theirs.capacity).merge(theirs)
+    mine.update(theirs)
+    return mine
@@ -1,6 +1,21 @@
-from collections import Counter
-from utils.whatsapp_parser import extract_emojis, extract_words, calculate_response_time
-from datetime import timedelta
+import os
+from utils.message_table import MessageTable
+from utils.stats_engine import (
+    SenderCounts, DateRange, HourlyActivity, DailyActivity, Streak, Emojis,
+    Vocabulary, Replies, LongestMessage, PartialStats,
+)
+from utils.tokenizer import Tokenizer
+from utils import stats_numpy
+
+# 'python' or 'numpy' (vectorized time metrics; falls back to python without numpy)
+STATS_BACKEND = os.environ.get('STATS_BACKEND', 'python')
+
+# Word/emoji counts stay exact up to TOPK_APPROX_AFTER messages, then switch
+# to fixed-size heavy-hitter summaries (utils/sketches.py): TOPK_CAPACITY
+# items chat-wide, TOPK_SENDER_CAPACITY per sender
+TOPK_APPROX_AFTER    = int(os.environ.get('TOPK_APPROX_AFTER', 250_000))
+TOPK_CAPACITY        = int(os.environ.get('TOPK_CAPACITY', 2000))
+TOPK_SENDER_CAPACITY = int(os.environ.get('TOPK_SENDER_CAPACITY', 200))
 
 STOPWORDS = {
     'hai','ka','ki','ke','main','tum','aur','the','a','is','in',
@@ -9,123 +24,64 @@ STOPWORDS = {
     'wo','vo','se','par','pe','ek','do','koi','aaj','kal','ok','okay'
 }
 
-def calculate_all_stats(messages):
+# Keyword families counted per sender; 'sorry' and 'haha' are reported per
+# person (sorry_p1, ...), any other family as a chat total (<name>_count).
+# Adding a family here costs no extra pass over the chat.
+KEYWORD_FAMILIES = {
+    'sorry':        ['sorry','maafi','galti','mafi'],
+    'haha':         ['haha','hehe','lol','lmao'],
+    'good_morning': ['good morning','gm','subah'],
+}
+
+# Key order of the stats dict (results page and stored JSON follow it)
+OUTPUT_KEYS = (
+    'total_messages', 'person1_name', 'person2_name', 'person1_count', 'person2_count',
+    'person1_percent', 'person2_percent', 'date_start', 'date_end', 'total_days',
+    'most_active_hour', 'most_active_day', 'hourly_data', 'daily_data', 'longest_streak',
+    'top5_emojis', 'total_emojis', 'p1_emoji_count', 'p2_emoji_count', 'top10_words',
+    'avg_response_min', 'p1_avg_response', 'p2_avg_response', 'fastest_reply_sec',
+    'sorry_p1', 'sorry_p2', 'haha_p1', 'haha_p2', 'good_morning_count',
+    'late_night_msgs', 'double_texts', 'longest_msg_sender', 'longest_msg_preview',
+    'longest_msg_length', 'first_msg_sender', 'first_msg_date', 'participants',
+)
+
+def resolve_backend(backend=None):
+    backend = backend or STATS_BACKEND
+    if backend == 'numpy' and not stats_numpy.HAVE_NUMPY:
+        return 'python'
+    return backend
+
+def default_metrics(backend=None, approx_after=TOPK_APPROX_AFTER):
+    top_counts = dict(approx_after=approx_after, capacity=TOPK_CAPACITY, sender_capacity=TOPK_SENDER_CAPACITY)
+    metrics = [
+        SenderCounts(), DateRange(), HourlyActivity(), DailyActivity(), Streak(),
+        Emojis(**top_counts), Vocabulary(Tokenizer(STOPWORDS, KEYWORD_FAMILIES), **top_counts),
+        Replies(), LongestMessage(),
+    ]
+    if resolve_backend(backend) == 'numpy':
+        metrics = stats_numpy.vectorize(metrics)
+    return metrics
+
+def calculate_all_stats(messages, metrics=None, backend=None):
+    """
+    messages: MessageTable, or a list of {datetime, sender, text} dicts.
+    metrics: accumulators to run (default_metrics()); all of them are fed
+    in a single pass over the messages.
+    backend: 'python' or 'numpy', defaults to STATS_BACKEND. Both give the
+    same output.
+    """
     if not messages or len(messages) < 2:
         return {}
-    
-    # Get unique senders (only first 2 for couple chat)
-    senders = list(dict.fromkeys([m['sender'] for m in messages]))
-    p1 = senders[0]
-    p2 = senders[1] if len(senders) > 1 else 'Others'
-    
-    p1_msgs = [m for m in messages if m['sender'] == p1]
-    p2_msgs = [m for m in messages if m['sender'] == p2]
-    total   = len(messages)
-    
-    # Time analysis
-    hours      = [m['datetime'].hour for m in messages]
-    days       = [m['datetime'].strftime('%a') for m in messages]
-    hourly     = dict(Counter(hours))
-    daily      = dict(Counter(days))          
-    most_active_hour = max(hourly, key=hourly.get)
-    most_active_day  = max(daily,  key=daily.get)
-    
-    # Date range
-    start_dt = messages[0]['datetime']
-    end_dt   = messages[-1]['datetime']
-    total_days = (end_dt - start_dt).days + 1
-    
-    # Streak
-    dates  = sorted(set(m['datetime'].date() for m in messages))
-    streak = max_streak = 1
-    for i in range(1, len(dates)):
-        if (dates[i] - dates[i-1]).days == 1:
-            streak += 1
-            max_streak = max(max_streak, streak)
-        else:
-            streak = 1
-    
-    # Emojis
-    all_emojis = []
-    p1_emoji_count = 0; p2_emoji_count = 0
-    for m in messages:
-        emojis = extract_emojis(m['text'])
-        all_emojis.extend(emojis)
-        if m['sender'] == p1: p1_emoji_count += len(emojis)
-        else:                  p2_emoji_count += len(emojis)
-    top5_emojis = [{'emoji':e,'count':c} for e,c in Counter(all_emojis).most_common(5)]
-    
-    # Words
-    all_words = []
-    for m in messages:
-        words = [w for w in extract_words(m['text']) if w not in STOPWORDS and len(w)>2]
-        all_words.extend(words)
-    top10_words = [{'word':w,'count':c} for w,c in Counter(all_words).most_common(10)]
-    
-    # Response times
-    response_times = []
-    for i in range(1, len(messages)):
-        if messages[i]['sender'] != messages[i-1]['sender']:
-            rt = calculate_response_time(messages[i-1]['datetime'], messages[i]['datetime'])
-            if 0 < rt < 86400:
-                response_times.append({'sender': messages[i]['sender'], 'time': rt})
-    
-    avg_rt       = sum(r['time'] for r in response_times)/len(response_times)/60 if response_times else 0
-    p1_responses = [r['time'] for r in response_times if r['sender']==p1]
-    p2_responses = [r['time'] for r in response_times if r['sender']==p2]
-    p1_avg_rt    = sum(p1_responses)/len(p1_responses)/60 if p1_responses else 0
-    p2_avg_rt    = sum(p2_responses)/len(p2_responses)/60 if p2_responses else 0
-    if response_times:
-        fastest_rt = min(r['time'] for r in response_times)
-    else:
-        fastest_rt = 0
-    
-    # Fun stats
-    def count_words_in_msgs(msgs, words):
-        return sum(1 for m in msgs if any(w.lower() in m['text'].lower() for w in words))
-    
-    sorry_words = ['sorry','maafi','galti','mafi']
-    haha_words  = ['haha','hehe','lol','lmao']
-    gm_words    = ['good morning','gm','subah']
-    
-    longest_msg = max(messages, key=lambda m: len(m['text']), default=messages[0])
-    
-    return {
-        'total_messages':     total,
-        'person1_name':       p1,
-        'person2_name':       p2,
-        'person1_count':      len(p1_msgs),
-        'person2_count':      len(p2_msgs),
-        'person1_percent':    round(len(p1_msgs)/total*100, 1),
-        'person2_percent':    round(len(p2_msgs)/total*100, 1),
-        'date_start':         start_dt.strftime('%b %Y'),
-        'date_end':           end_dt.strftime('%b %Y'),
+    table   = MessageTable.from_messages(messages)
+    metrics = metrics if metrics is not None else default_metrics(backend)
+    return stats_from_partial(PartialStats.from_table(table, metrics))
 
-        'total_days':         total_days,
-        'most_active_hour':   most_active_hour,
-        'most_active_day':    most_active_day,
-        'hourly_data':        hourly,
-        'daily_data':         daily,
-        'longest_streak':     max_streak,
-        'top5_emojis':        top5_emojis,
-        'total_emojis':       len(all_emojis),
-        'p1_emoji_count':     p1_emoji_count,
-        'p2_emoji_count':     p2_emoji_count,
-        'top10_words':        top10_words,
-        'avg_response_min':   round(avg_rt, 1),
-        'p1_avg_response':    round(p1_avg_rt, 1),
-        'p2_avg_response':    round(p2_avg_rt, 1),
-        'fastest_reply_sec':  int(fastest_rt),
-        'sorry_p1':           count_words_in_msgs(p1_msgs, sorry_words),
-        'sorry_p2':           count_words_in_msgs(p2_msgs, sorry_words),
-        'haha_p1':            count_words_in_msgs(p1_msgs, haha_words),
-        'haha_p2':            count_words_in_msgs(p2_msgs, haha_words),
-        'good_morning_count': count_words_in_msgs(messages, gm_words),
-        'late_night_msgs':    len([m for m in messages if 0 <= m['datetime'].hour <= 4]),
-        'double_texts':       sum(1 for i in range(1,len(messages)) if messages[i]['sender']==messages[i-1]['sender']),
-        'longest_msg_sender': longest_msg['sender'],
-        'longest_msg_preview':longest_msg['text'][:50],
-        'longest_msg_length': len(longest_msg['text']),
-        'first_msg_sender':   messages[0]['sender'],
-        'first_msg_date':     messages[0]['datetime'].strftime('%d %b %Y'),
-    }
+def stats_from_partial(partial):
+    """Final stats dict of a (merged) PartialStats; {} below 2 messages"""
+    if partial.messages < 2:
+        return {}
+    results = partial.results()
+    # Known keys in their usual order, then anything extra metrics added
+    ordered = {k: results.pop(k) for k in OUTPUT_KEYS if k in results}
+    ordered.update(results)
+    return ordered
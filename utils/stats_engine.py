@@ -0,0 +1,576 @@
+"""
+One-pass stats engine.
+
+Every metric is an accumulator: the engine walks the messages once and feeds
+each (timestamp, sender_id, text) row to every metric's add(), then asks each
+metric for its output keys. A new metric is a new Metric subclass added to
+the list - it never needs its own scan over the chat. State is kept per
+sender id, so any number of participants costs the same single pass; each
+metric reports chat-wide keys (result) and per-participant ones
+(sender_result), collected into the 'participants' list.
+
+Metrics are also mergeable: the state built from one slice of a chat can
+absorb the state of the slice that follows it (merge()), so a big chat can be
+cut into line ranges, analyzed separately and combined into exactly what one
+pass would have built. PartialStats carries a slice's metrics and senders,
+and round-trips through a JSON-able state (to_state / from_state) so a
+stored checkpoint can later absorb the messages a chat gained since.
+"""
+import hashlib
+from collections import Counter
+from utils.sketches import HeavyHitters, merge_counts
+from utils.message_table import to_datetime, hour_of, day_of, weekday_of
+from utils.whatsapp_parser import extract_emojis
+
+class Metric:
+    """
+    Base accumulator. senders (list of names, by sender id) is passed to result().
+    A metric with vectorized = True gets the whole table via add_table() instead
+    of one add() call per row.
+    """
+    vectorized   = False
+    name         = None         # key of this metric's state in a checkpoint
+    state_fields = ()           # attributes saved by to_state()
+
+    def add(self, ts, sid, text):
+        raise NotImplementedError
+
+    def add_table(self, table):
+        for ts, sid, text in table.rows():
+            self.add(ts, sid, text)
+
+    def merge(self, other, remap):
+        """
+        Absorb the state of the same metric built over the messages right
+        after ours. remap[sid] is other's sender id in our id space.
+        """
+        raise NotImplementedError
+
+    def result(self, senders):
+        raise NotImplementedError
+
+    def sender_result(self, sid):
+        """This metric's fields of one participant's row"""
+        return {}
+
+    def to_state(self):
+        return {f: _encode(getattr(self, f)) for f in self.state_fields}
+
+    def load_state(self, state):
+        for f in self.state_fields:
+            setattr(self, f, _decode(getattr(self, f), state[f]))
+
+def _encode(value):
+    # dicts/Counters as ordered [key, value] pairs (keeps int keys and order),
+    # sets sorted, HeavyHitters as their own state dict
+    if isinstance(value, HeavyHitters):
+        return value.to_state()
+    if isinstance(value, dict):
+        return [[k, v] for k, v in value.items()]
+    if isinstance(value, set):
+        return sorted(value)
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+def _decode(initial, value):
+    # The freshly built attribute tells what the saved value was
+    if isinstance(initial, dict):
+        if isinstance(value, dict):
+            return HeavyHitters.from_state(value)
+        return type(initial)({k: v for k, v in value})
+    if isinstance(initial, set):
+        return set(value)
+    if initial is None and isinstance(value, list):
+        return tuple(value)     # a (ts, sid, ...) row
+    return value
+
+def _per_sender(counts, sid, n=1):
+    # Grow a per-sender-id list on demand
+    while len(counts) <= sid:
+        counts.append(0)
+    counts[sid] += n
+
+def _merge_per_sender(counts, other, remap):
+    for sid, n in enumerate(other):
+        if n:
+            _per_sender(counts, remap[sid], n)
+
+def _merge_histogram(hist, other):
+    # New keys land after ours, keeping order of first appearance
+    for key, n in other.items():
+        hist[key] = hist.get(key, 0) + n
+
+def _remap_row(row, remap):
+    return None if row is None else (row[0], remap[row[1]], *row[2:])
+
+class TextDigest(str):
+    """A message's text as saved in a checkpoint: its hash, never the words"""
+
+def text_digest(text):
+    """TextDigest of a message's text (a TextDigest is returned as is)"""
+    if isinstance(text, TextDigest):
+        return text
+    return TextDigest(hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest())
+
+def _digest_row(row):
+    return None if row is None else (row[0], row[1], text_digest(row[2]))
+
+def _at(counts, sid):
+    return counts[sid] if sid is not None and sid < len(counts) else 0
+
+def couple_ids(senders):
+    """Sender ids of person1/person2; person2 is None for a one-sided chat"""
+    return 0, (1 if len(senders) > 1 else None)
+
+class SenderCounts(Metric):
+    name         = 'sender_counts'
+    state_fields = ('counts', 'total')
+
+    def __init__(self):
+        self.counts = []
+        self.total  = 0
+
+    def add(self, ts, sid, text):
+        _per_sender(self.counts, sid)
+        self.total += 1
+
+    def merge(self, other, remap):
+        _merge_per_sender(self.counts, other.counts, remap)
+        self.total += other.total
+
+    def result(self, senders):
+        p1_id, p2_id = couple_ids(senders)
+        p1_count, p2_count = _at(self.counts, p1_id), _at(self.counts, p2_id)
+        return {
+            'total_messages':  self.total,
+            'person1_name':    senders[p1_id],
+            'person2_name':    senders[p2_id] if p2_id is not None else 'Others',
+            'person1_count':   p1_count,
+            'person2_count':   p2_count,
+            'person1_percent': round(p1_count/self.total*100, 1),
+            'person2_percent': round(p2_count/self.total*100, 1),
+        }
+
+    def sender_result(self, sid):
+        count = _at(self.counts, sid)
+        return {'messages': count, 'percent': round(count/self.total*100, 1)}
+
+class DateRange(Metric):
+    name         = 'date_range'
+    state_fields = ('first', 'last')
+
+    def __init__(self):
+        self.first = None       # (ts, sid, text) of the first message
+        self.last  = None
+
+    def to_state(self):
+        # The text only feeds message fingerprints, so a hash of it will do
+        return {f: _encode(_digest_row(getattr(self, f))) for f in self.state_fields}
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.first, self.last = (None if row is None else (row[0], row[1], TextDigest(row[2]))
+                                 for row in (self.first, self.last))
+
+    def add(self, ts, sid, text):
+        if self.first is None:
+            self.first = (ts, sid, text)
+        self.last = (ts, sid, text)
+
+    def merge(self, other, remap):
+        if other.last is None:
+            return
+        if self.first is None:
+            self.first = _remap_row(other.first, remap)
+        self.last = _remap_row(other.last, remap)
+
+    def result(self, senders):
+        start_dt = to_datetime(self.first[0])
+        end_dt   = to_datetime(self.last[0])
+        return {
+            'date_start':       start_dt.strftime('%b %Y'),
+            'date_end':         end_dt.strftime('%b %Y'),
+            'total_days':       (end_dt - start_dt).days + 1,
+            'first_msg_sender': senders[self.first[1]],
+            'first_msg_date':   start_dt.strftime('%d %b %Y'),
+        }
+
+class HourlyActivity(Metric):
+    name         = 'hourly'
+    state_fields = ('hourly',)
+
+    def __init__(self):
+        self.hourly = {}        # hour -> count, in order of first appearance
+
+    def add(self, ts, sid, text):
+        hour = hour_of(ts)
+        self.hourly[hour] = self.hourly.get(hour, 0) + 1
+
+    def merge(self, other, remap):
+        _merge_histogram(self.hourly, other.hourly)
+
+    def result(self, senders):
+        return {
+            'most_active_hour': max(self.hourly, key=self.hourly.get),
+            'hourly_data':      self.hourly,
+            'late_night_msgs':  sum(self.hourly.get(h, 0) for h in range(5)),
+        }
+
+class DailyActivity(Metric):
+    name         = 'daily'
+    state_fields = ('daily',)
+
+    def __init__(self):
+        self.daily = {}
+
+    def add(self, ts, sid, text):
+        day = weekday_of(ts)
+        self.daily[day] = self.daily.get(day, 0) + 1
+
+    def merge(self, other, remap):
+        _merge_histogram(self.daily, other.daily)
+
+    def result(self, senders):
+        return {
+            'most_active_day': max(self.daily, key=self.daily.get),
+            'daily_data':      self.daily,
+        }
+
+class Streak(Metric):
+    name         = 'streak'
+    state_fields = ('days',)
+
+    def __init__(self):
+        self.days = set()
+
+    def add(self, ts, sid, text):
+        self.days.add(day_of(ts))
+
+    def merge(self, other, remap):
+        self.days |= other.days
+
+    def result(self, senders):
+        dates  = sorted(self.days)
+        streak = max_streak = 1
+        for i in range(1, len(dates)):
+            if dates[i] - dates[i-1] == 1:
+                streak += 1
+                max_streak = max(max_streak, streak)
+            else:
+                streak = 1
+        return {'longest_streak': max_streak}
+
+class TopCounts(Metric):
+    """
+    Base for item counting with top-k output: counts (whole chat) and
+    by_sender (per sender id) are exact Counters until approx_after
+    messages, then bounded HeavyHitters summaries of capacity /
+    sender_capacity items (see utils/sketches.py for the error bound).
+    approx_after=None keeps them exact.
+    """
+    def __init__(self, approx_after=None, capacity=2000, sender_capacity=200):
+        self.approx_after    = approx_after
+        self.capacity        = capacity
+        self.sender_capacity = sender_capacity
+        self.counts          = Counter()
+        self.by_sender       = []
+        self.messages        = 0
+
+    @property
+    def approximate(self):
+        return isinstance(self.counts, HeavyHitters)
+
+    def sender_counts(self, sid):
+        by_sender = self.by_sender
+        while len(by_sender) <= sid:
+            by_sender.append(HeavyHitters(self.sender_capacity) if self.approximate else Counter())
+        return by_sender[sid]
+
+    def approximate_counts(self):
+        """Switch every exact Counter to a HeavyHitters summary"""
+        if not self.approximate:
+            self.counts = HeavyHitters.from_counter(self.counts, self.capacity)
+        self.by_sender = [c if isinstance(c, HeavyHitters) else HeavyHitters.from_counter(c, self.sender_capacity)
+                          for c in self.by_sender]
+
+    def merge(self, other, remap):
+        self.counts = merge_counts(self.counts, other.counts)
+        for sid, counts in enumerate(other.by_sender):
+            if counts:
+                mine = remap[sid]
+                self.by_sender[mine] = merge_counts(self.sender_counts(mine), counts)
+        self.messages += other.messages
+        if self.approximate or (self.approx_after is not None and self.messages >= self.approx_after):
+            self.approximate_counts()
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.by_sender = [_decode(Counter(), counts) for counts in state['by_sender']]
+
+    def sender_total(self, sid):
+        return self.by_sender[sid].total() if sid is not None and sid < len(self.by_sender) else 0
+
+class Emojis(TopCounts):
+    name         = 'emojis'
+    state_fields = ('counts', 'by_sender', 'messages')
+
+    def add(self, ts, sid, text):
+        self.messages += 1
+        if self.messages == self.approx_after:
+            self.approximate_counts()
+        emojis = extract_emojis(text)
+        if emojis:
+            self.counts.update(emojis)
+            self.sender_counts(sid).update(emojis)
+
+    def result(self, senders):
+        p1_id, p2_id = couple_ids(senders)
+        return {
+            'top5_emojis':    [{'emoji':e,'count':c} for e,c in self.counts.most_common(5)],
+            'total_emojis':   self.counts.total(),
+            'p1_emoji_count': self.sender_total(p1_id),
+            'p2_emoji_count': self.sender_total(p2_id),
+        }
+
+    def sender_result(self, sid):
+        top = self.by_sender[sid].most_common(1) if sid < len(self.by_sender) else []
+        return {'emojis': self.sender_total(sid), 'top_emoji': top[0][0] if top else None}
+
+class Replies(Metric):
+    """Response times (sender changes within a day) and double texts"""
+    name         = 'replies'
+    state_fields = ('first', 'prev', 'total', 'count', 'fastest', 'sums', 'counts', 'double_texts')
+
+    def __init__(self):
+        self.first        = None        # (ts, sid) of the first message, for merge()
+        self.prev         = None        # (ts, sid) of the previous message
+        self.total        = 0
+        self.count        = 0
+        self.fastest      = None
+        self.sums         = []          # per sender id
+        self.counts       = []
+        self.double_texts = 0
+
+    def add(self, ts, sid, text):
+        prev, self.prev = self.prev, (ts, sid)
+        if prev is None:
+            self.first = self.prev
+            return
+        if sid == prev[1]:
+            self.double_texts += 1
+            return
+        rt = ts - prev[0]
+        if 0 < rt < 86400:
+            self.total += rt
+            self.count += 1
+            if self.fastest is None or rt < self.fastest:
+                self.fastest = rt
+            _per_sender(self.sums, sid, rt)
+            _per_sender(self.counts, sid)
+
+    def merge(self, other, remap):
+        if other.prev is None:
+            return
+        if self.prev is None:
+            self.first = _remap_row(other.first, remap)
+        else:                           # the one gap that spans both slices
+            ts, sid = other.first
+            self.add(ts, remap[sid], None)
+        self.total        += other.total
+        self.count        += other.count
+        self.double_texts += other.double_texts
+        if other.fastest is not None and (self.fastest is None or other.fastest < self.fastest):
+            self.fastest = other.fastest
+        _merge_per_sender(self.sums, other.sums, remap)
+        _merge_per_sender(self.counts, other.counts, remap)
+        self.prev = _remap_row(other.prev, remap)
+
+    def avg_min(self, sid):
+        n = _at(self.counts, sid)
+        return self.sums[sid]/n/60 if n else 0
+
+    def result(self, senders):
+        p1_id, p2_id = couple_ids(senders)
+        return {
+            'avg_response_min':  round(self.total/self.count/60 if self.count else 0, 1),
+            'p1_avg_response':   round(self.avg_min(p1_id), 1),
+            'p2_avg_response':   round(self.avg_min(p2_id), 1),
+            'fastest_reply_sec': int(self.fastest or 0),
+            'double_texts':      self.double_texts,
+        }
+
+    def sender_result(self, sid):
+        return {'avg_response_min': round(self.avg_min(sid), 1)}
+
+class Vocabulary(TopCounts):
+    """
+    Top words and keyword families, from one lowercase + tokenize per message.
+    tokenizer: utils.tokenizer.Tokenizer (stopwords and families live there).
+    counts / by_sender count words. A family's count is the number of
+    messages mentioning any of its words (always exact).
+    """
+    name         = 'vocabulary'
+    state_fields = ('counts', 'by_sender', 'messages', 'families')
+
+    def __init__(self, tokenizer, **top_counts):
+        super().__init__(**top_counts)
+        self.tokenizer = tokenizer
+        self.families  = {name: [] for name in tokenizer.keywords.names}   # per sender id
+
+    def add(self, ts, sid, text):
+        self.messages += 1
+        if self.messages == self.approx_after:
+            self.approximate_counts()
+        words, families = self.tokenizer.tokenize(text)
+        if words:
+            self.counts.update(words)
+            self.sender_counts(sid).update(words)
+        for name in families:
+            _per_sender(self.families[name], sid)
+
+    def merge(self, other, remap):
+        super().merge(other, remap)
+        for name, counts in other.families.items():
+            _merge_per_sender(self.families.setdefault(name, []), counts, remap)
+
+    def load_state(self, state):
+        saved = [name for name, counts in state['families']]
+        if saved != list(self.families):
+            raise ValueError('checkpoint has different keyword families')
+        super().load_state(state)
+
+    def count(self, family, sid=None):
+        """Count for one sender id, or for everyone when sid is None"""
+        counts = self.families.get(family, [])
+        return sum(counts) if sid is None else _at(counts, sid)
+
+    def result(self, senders):
+        p1_id, p2_id = couple_ids(senders)
+        results = {'top10_words': [{'word':w,'count':c} for w,c in self.counts.most_common(10)]}
+        for name in self.families:
+            if name in ('sorry', 'haha'):
+                results[f'{name}_p1'] = self.count(name, p1_id)
+                results[f'{name}_p2'] = self.count(name, p2_id) if p2_id is not None else 0
+            else:
+                results[f'{name}_count'] = self.count(name)
+        return results
+
+    def sender_result(self, sid):
+        words   = self.by_sender[sid].most_common(3) if sid < len(self.by_sender) else []
+        results = {'top_words': [w for w, c in words]}
+        for name in self.families:
+            results[name] = self.count(name, sid)
+        return results
+
+class LongestMessage(Metric):
+    name         = 'longest_message'
+    state_fields = ('length', 'sid', 'preview')
+
+    PREVIEW_CHARS = 50
+
+    def __init__(self):
+        self.length  = -1
+        self.sid     = None
+        self.preview = ''       # only the start of the text is ever shown (or saved)
+
+    def add(self, ts, sid, text):
+        if len(text) > self.length:     # first one wins on ties
+            self.length, self.sid, self.preview = len(text), sid, text[:self.PREVIEW_CHARS]
+
+    def merge(self, other, remap):
+        if other.length > self.length:
+            self.length, self.sid, self.preview = other.length, remap[other.sid], other.preview
+
+    def result(self, senders):
+        return {
+            'longest_msg_sender':  senders[self.sid],
+            'longest_msg_preview': self.preview,
+            'longest_msg_length':  self.length,
+        }
+
+def run_metrics(table, metrics):
+    """Feed every row of a MessageTable to every metric, in one pass"""
+    for m in metrics:
+        if m.vectorized:
+            m.add_table(table)
+    adds = [m.add for m in metrics if not m.vectorized]
+    if adds:
+        for ts, sid, text in table.rows():
+            for add in adds:
+                add(ts, sid, text)
+    return metrics
+
+def collect_results(metrics, senders):
+    results      = {}
+    participants = [{'name': name} for name in senders]
+    for m in metrics:
+        results.update(m.result(senders))
+        for sid, row in enumerate(participants):
+            row.update(m.sender_result(sid))
+    # Most active first; ties keep order of first message
+    participants.sort(key=lambda row: -row.get('messages', 0))
+    results['participants'] = participants
+    return results
+
+STATE_VERSION = 4
+
+class PartialStats:
+    """
+    Metric state for a contiguous run of messages, plus the sender names its
+    sender ids refer to. Partials of consecutive slices merge left to right.
+    """
+    def __init__(self, metrics, senders=(), messages=0):
+        self.metrics  = metrics
+        self.senders  = list(senders)
+        self.messages = messages
+        self._index   = {name: sid for sid, name in enumerate(self.senders)}
+
+    @classmethod
+    def from_table(cls, table, metrics):
+        return cls(run_metrics(table, metrics), table.senders, len(table))
+
+    @classmethod
+    def from_state(cls, state, metrics):
+        """
+        Rebuild from to_state() into fresh metrics. Raises ValueError when the
+        state does not cover every metric (it was saved by another version).
+        """
+        if state.get('version') != STATE_VERSION:
+            raise ValueError('unknown checkpoint version')
+        saved = state['metrics']
+        for m in metrics:
+            if m.name not in saved:
+                raise ValueError(f'checkpoint has no {m.name} state')
+            m.load_state(saved[m.name])
+        return cls(metrics, state['senders'], state['messages'])
+
+    def to_state(self):
+        return {
+            'version':  STATE_VERSION,
+            'senders':  self.senders,
+            'messages': self.messages,
+            'metrics':  {m.name: m.to_state() for m in self.metrics},
+        }
+
+    def find(self, cls):
+        """The first metric that is a cls, or None"""
+        return next((m for m in self.metrics if isinstance(m, cls)), None)
+
+    def sender_id(self, sender):
+        sid = self._index.get(sender)
+        if sid is None:
+            sid = self._index[sender] = len(self.senders)
+            self.senders.append(sender)
+        return sid
+
+    def merge(self, later):
+        """Fold in the partial of the messages that come right after ours"""
+        remap = [self.sender_id(name) for name in later.senders]
+        for mine, theirs in zip(self.metrics, later.metrics):
+            mine.merge(theirs, remap)
+        self.messages += later.messages
+        return self
+
+    def results(self):
+        return collect_results(self.metrics, self.senders)
@@ -0,0 +1,129 @@
+"""
+Vectorized (NumPy) versions of the time-based metrics.
+
+Each class subclasses its pure-Python metric and fills the very same state
+from the table's int64 timestamp / sender-id columns in one shot (bincount
+for histograms, diff for reply gaps, run comparisons for double texts), so
+result() is shared and the output is identical. NumPy is optional: without
+it, HAVE_NUMPY is False and the python backend is used.
+"""
+from utils.message_table import WEEKDAYS
+from utils.stats_engine import (
+    SenderCounts, DateRange, HourlyActivity, DailyActivity, Streak, Replies,
+)
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+def table_columns(table):
+    """Zero-copy int64 timestamps and uint32 sender ids of a MessageTable"""
+    ts  = np.frombuffer(table.timestamps, dtype=np.int64)
+    sid = np.frombuffer(table.sender_ids, dtype=np.uint32)
+    return ts, sid
+
+def _add_counts(counts, new):
+    # Elementwise add a bincount result onto a per-id python list
+    new = new.tolist()
+    if len(counts) < len(new):
+        counts.extend([0] * (len(new) - len(counts)))
+    for i, n in enumerate(new):
+        counts[i] += n
+
+def _add_histogram(hist, keys, labels=None):
+    # Update an insertion-ordered {key: count} dict; new keys go in order of first appearance
+    values, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    for i in np.argsort(first, kind='stable'):
+        key = int(values[i]) if labels is None else labels[int(values[i])]
+        hist[key] = hist.get(key, 0) + int(counts[i])
+
+class NumpySenderCounts(SenderCounts):
+    vectorized = True
+
+    def add_table(self, table):
+        ts, sid = table_columns(table)
+        _add_counts(self.counts, np.bincount(sid))
+        self.total += len(sid)
+
+class NumpyDateRange(DateRange):
+    vectorized = True
+
+    def add_table(self, table):
+        if not len(table):
+            return
+        if self.first is None:
+            self.first = (table.timestamps[0], table.sender_ids[0], table.texts[0])
+        self.last = (table.timestamps[-1], table.sender_ids[-1], table.texts[-1])
+
+class NumpyHourlyActivity(HourlyActivity):
+    vectorized = True
+
+    def add_table(self, table):
+        ts, sid = table_columns(table)
+        if len(ts):
+            _add_histogram(self.hourly, ts // 3600 % 24)
+
+class NumpyDailyActivity(DailyActivity):
+    vectorized = True
+
+    def add_table(self, table):
+        ts, sid = table_columns(table)
+        if len(ts):
+            _add_histogram(self.daily, (ts // 86400 + 3) % 7, WEEKDAYS)
+
+class NumpyStreak(Streak):
+    vectorized = True
+
+    def add_table(self, table):
+        ts, sid = table_columns(table)
+        self.days.update(np.unique(ts // 86400).tolist())
+
+class NumpyReplies(Replies):
+    vectorized = True
+
+    def add_table(self, table):
+        ts, sid = table_columns(table)
+        if not len(ts):
+            return
+        if self.prev is None:
+            self.first = (int(ts[0]), int(sid[0]))
+        else:                           # carry on from rows fed earlier
+            ts  = np.concatenate(([self.prev[0]], ts))
+            sid = np.concatenate(([self.prev[1]], sid)).astype(np.uint32)
+        self.prev = (int(ts[-1]), int(sid[-1]))
+
+        same = sid[1:] == sid[:-1]
+        self.double_texts += int(same.sum())
+        gaps  = np.diff(ts)
+        valid = ~same & (gaps > 0) & (gaps < 86400)
+        if not valid.any():
+            return
+        gaps, responders = gaps[valid], sid[1:][valid]
+        self.total += int(gaps.sum())
+        self.count += int(valid.sum())
+        fastest = int(gaps.min())
+        if self.fastest is None or fastest < self.fastest:
+            self.fastest = fastest
+        # int64 weights stay exact as float64 far beyond any chat's reply total
+        _add_counts(self.sums, np.bincount(responders, weights=gaps).astype(np.int64))
+        _add_counts(self.counts, np.bincount(responders))
+
+NUMPY_METRICS = {
+    SenderCounts:   NumpySenderCounts,
+    DateRange:      NumpyDateRange,
+    HourlyActivity: NumpyHourlyActivity,
+    DailyActivity:  NumpyDailyActivity,
+    Streak:         NumpyStreak,
+    Replies:        NumpyReplies,
+}
+
+def vectorize(metrics):
+    """Swap in the NumPy version of every metric that has one"""
+    swapped = []
+    for m in metrics:
+        cls = NUMPY_METRICS.get(type(m))
+        swapped.append(cls() if cls else m)
+    return swapped
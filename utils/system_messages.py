@@ -0,0 +1,60 @@
+import re
+
+# Regex fragments per language, matched at the START of the message body
+# (the text after "Name: "), so ordinary messages are rejected on their first
+# character. iPhone prefixes system/media bodies with U+200E (LRM); Android
+# system lines ("X left", "X added Y") have no "Name: " part at all and are
+# already dropped by the line pattern.
+SYSTEM_PATTERNS = {
+    'en': {
+        'system': [
+            r'\u200e?Messages and calls are end-to-end encrypted',
+            r'\u200e?Your security code with .+ changed',
+            r'\u200e(?:Missed )?(?:voice|video) call',
+            r'\u200e.*(?:changed their phone number|created group|added you$| left$| added .+| removed .+)',
+            r"\u200e.*joined using this group's invite link$",
+        ],
+        'media': [
+            r'<Media omitted>$',
+            r'null$',
+            r'\u200e.*(?:image|video|audio|sticker|GIF|document|Contact card) omitted$',
+            r'\u200e?<attached: [^>]+>$',
+        ],
+        'deleted': [
+            r'\u200e?This message was deleted\.?$',
+            r'\u200e?You deleted this message\.?$',
+        ],
+    },
+}
+
+KINDS = ('system', 'media', 'deleted')
+
+def register_language(code, system=(), media=(), deleted=()):
+    """Add (or extend) a language's system/media/deleted body patterns"""
+    patterns = SYSTEM_PATTERNS.setdefault(code, {kind: [] for kind in KINDS})
+    for kind, fragments in zip(KINDS, (system, media, deleted)):
+        patterns.setdefault(kind, []).extend(fragments)
+
+class MessageClassifier:
+    """
+    One precompiled alternation over every language's patterns; a single
+    match() both detects and classifies a body as system/media/deleted.
+    """
+    def __init__(self, languages=('en',)):
+        groups = []
+        for kind in KINDS:
+            fragments = [f for lang in languages
+                           for f in SYSTEM_PATTERNS.get(lang, {}).get(kind, [])]
+            if fragments:
+                groups.append(f'(?P<{kind}>' + '|'.join(f'(?:{f})' for f in fragments) + ')')
+        self.languages = tuple(languages)
+        self._match    = re.compile('|'.join(groups)).match if groups else None
+
+    def classify(self, body):
+        """Returns 'system', 'media', 'deleted' or None for a real message"""
+        if self._match is None:
+            return None
+        match = self._match(body)
+        return match.lastgroup if match else None
+
+DEFAULT_CLASSIFIER = MessageClassifier()
@@ -0,0 +1,52 @@
+import re
+
+# Words are runs of Latin or Devanagari letters, matched on lowercased text
+WORD_RE = re.compile(r'[a-z\u0900-\u097F]+')
+
+class KeywordMatcher:
+    """
+    Every keyword of every family in one compiled alternation.
+    Keywords match as substrings of the lowercased text (so 'haha' also
+    counts 'hahaha'). Alternatives are longest first, and each keyword maps to
+    the families of every configured keyword it contains, so one match at a
+    position accounts for all keywords that start there.
+    """
+    def __init__(self, families):
+        self.names = list(families)
+        keywords   = {w.lower() for words in families.values() for w in words}
+        self._families = {
+            kw: frozenset(name for name, words in families.items()
+                          if any(w.lower() in kw for w in words))
+            for kw in keywords
+        }
+        alternation  = '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+        self._search = re.compile(alternation).search if keywords else None
+
+    def families_in(self, lower):
+        """Names of the families with at least one keyword in lowercased text"""
+        found, pos = set(), 0
+        if self._search is None:
+            return found
+        while True:
+            match = self._search(lower, pos)
+            if match is None:
+                return found
+            found |= self._families[match.group()]
+            pos = match.start() + 1     # keywords may overlap
+
+class Tokenizer:
+    """
+    Lowercases and tokenizes a message once. Returns the words worth counting
+    (no stopwords, longer than min_len - 1) and the keyword families present.
+    """
+    def __init__(self, stopwords, families, min_len=3):
+        self.stopwords = frozenset(stopwords)
+        self.min_len   = min_len
+        self.keywords  = KeywordMatcher(families)
+
+    def tokenize(self, text):
+        lower     = text.lower()
+        stopwords = self.stopwords
+        min_len   = self.min_len
+        words     = [w for w in WORD_RE.findall(lower) if len(w) >= min_len and w not in stopwords]
+        return words, self.keywords.families_in(lower)
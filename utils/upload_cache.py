@@ -0,0 +1,83 @@
+"""
+Upload-level cache of computed stats, keyed by a hash of the chat content.
+
+The key is a streaming blake2b over the chat's non-empty, stripped lines -
+exactly what the parser looks at - so the same chat uploaded again, as .txt
+or .zip, with CRLF or LF line ends, hits the same entry and skips the parse
+and stats run. Entries expire after UPLOAD_CACHE_TTL_HOURS and the table
+keeps at most UPLOAD_CACHE_MAX_ENTRIES, least recently used dropped first.
+Only logged-in uploads are stored, each under its uploader, so deleting
+the account deletes the entries too.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from database.models import UploadCache, db
+from utils.whatsapp_parser import iter_chat_lines
+
+# Bump when parser or stats output changes, so old entries stop matching
+CACHE_KEY_VERSION = b'3'
+
+CHECKPOINT_FIELDS = ('results_json', 'results_blob', 'checkpoint', 'msg_count', 'first_msg_hash', 'last_msg_hash')
+
+def chat_content_hash(source):
+    digest = hashlib.blake2b(CACHE_KEY_VERSION, digest_size=20)
+    for line in iter_chat_lines(source):
+        line = line.strip()
+        if line:
+            digest.update(line.encode('utf-8'))
+            digest.update(b'\n')
+    return digest.hexdigest()
+
+def _ttl():
+    return timedelta(hours=current_app.config.get('UPLOAD_CACHE_TTL_HOURS', 24 * 7))
+
+def lookup(content_hash):
+    """Live cache entry for a content hash (its use is recorded), or None"""
+    entry = UploadCache.query.filter_by(content_hash=content_hash).first()
+    now   = datetime.utcnow()
+    if entry is None or entry.last_used_at < now - _ttl():
+        return None
+    entry.hits         = (entry.hits or 0) + 1
+    entry.last_used_at = now
+    db.session.commit()
+    return entry
+
+def copy_into(entry, analysis):
+    """Fill an Analysis with a cache entry's stats and (if it has an owner) checkpoint"""
+    for field in CHECKPOINT_FIELDS:
+        if field == 'checkpoint' and analysis.user_id is None:
+            continue
+        setattr(analysis, field, getattr(entry, field))
+    return analysis
+
+def store(content_hash, analysis):
+    """Cache an owned analysis's stats under content_hash, then prune the table"""
+    if analysis.user_id is None:
+        return
+    entry = UploadCache.query.filter_by(content_hash=content_hash).first() or UploadCache(content_hash=content_hash)
+    for field in CHECKPOINT_FIELDS:
+        setattr(entry, field, getattr(analysis, field))
+    entry.user_id      = analysis.user_id
+    entry.last_used_at = datetime.utcnow()
+    db.session.add(entry)
+    try:
+        db.session.commit()
+    except IntegrityError:              # another worker cached the same chat first
+        db.session.rollback()
+    prune()
+
+def delete_user_entries(user_id):
+    """Drop the entries a user uploaded (caller commits)"""
+    UploadCache.query.filter_by(user_id=user_id).delete()
+
+def prune():
+    """Drop expired entries, then the least recently used beyond the size bound"""
+    max_entries = current_app.config.get('UPLOAD_CACHE_MAX_ENTRIES', 1000)
+    UploadCache.query.filter(UploadCache.last_used_at < datetime.utcnow() - _ttl()).delete()
+    stale = (db.session.query(UploadCache.id)
+             .order_by(UploadCache.last_used_at.desc())
+             .offset(max_entries))
+    UploadCache.query.filter(UploadCache.id.in_(stale.scalar_subquery())).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,107 @@
+"""
+Upload -> Analysis, shared by the request handler and background jobs.
+
+Cache lookup by content hash, then parse + stats (parallel for big chats,
+tail-only for a newer export of a chat the user already has), then save.
+"""
+from database.models import Analysis, db
+from utils.chat_export import open_chat_export, ChatExportError
+from utils.stats_calculator import stats_from_partial
+from utils.incremental import analyze_or_resume, save_checkpoint
+from utils.results_codec import store_results
+from utils.results_cache import results_cache
+from utils.user_summary import refresh_summary
+from utils import image_storage, upload_cache
+
+MIN_MESSAGES = 10
+
+# How often (in lines) the progress callback is called
+PROGRESS_EVERY_LINES = 20_000
+
+def previous_analysis(user_id, first_msg_hash):
+    """The user's latest analysis of a chat that opens with the same message"""
+    if user_id is None:
+        return None
+    return (Analysis.query
+            .filter_by(user_id=user_id, first_msg_hash=first_msg_hash)
+            .filter(Analysis.checkpoint.isnot(None))
+            .order_by(Analysis.id.desc())
+            .first())
+
+def _report_progress(lines, stream, size, progress):
+    # Share of the upload read so far (zip members are read from the same
+    # stream, so its position tracks them too)
+    for i, line in enumerate(lines, 1):
+        if i % PROGRESS_EVERY_LINES == 0:
+            progress(stream.tell() / size if size else 0)
+        yield line
+
+def process_upload(file, user_id, chat_name, progress=None):
+    """
+    file: FileStorage or binary stream of a .txt/.zip export.
+    progress: optional callback(fraction) during the parse.
+    Returns: (Analysis, note) - note is a message for the user or None.
+    Raises ChatExportError for anything that is not a usable chat.
+    """
+    stream = getattr(file, 'stream', file)
+    size   = stream.seek(0, 2)
+    stream.seek(0)
+
+    # Same chat uploaded before? Reuse its stats without parsing
+    with open_chat_export(stream) as chat_lines:
+        content_hash = upload_cache.chat_content_hash(chat_lines)
+    cached = upload_cache.lookup(content_hash)
+    if cached is not None:
+        previous = previous_analysis(user_id, cached.first_msg_hash)
+        if previous is not None and previous.last_msg_hash == cached.last_msg_hash:
+            return previous, 'Is chat mein koi naye messages nahi hain - purana analysis dikha rahe hain.'
+        if previous is None:
+            analysis = upload_cache.copy_into(cached, Analysis(
+                user_id      = user_id,
+                chat_name    = chat_name,
+                file_deleted = True
+            ))
+            db.session.add(analysis)
+            db.session.commit()
+            refresh_summary(user_id)
+            return analysis, None
+        # else: a shorter export of this chat exists - update it below
+    stream.seek(0)
+
+    # Parse straight from the upload stream (or the chat inside a .zip
+    # export) - the chat never touches disk. Big chats are analyzed in
+    # line ranges across worker processes; a newer export of a chat this
+    # user already analyzed only runs its new messages.
+    with open_chat_export(stream) as chat_lines:
+        if progress is not None:
+            chat_lines = _report_progress(chat_lines, stream, size, progress)
+        partial, analysis = analyze_or_resume(
+            chat_lines, lambda first_hash: previous_analysis(user_id, first_hash))
+
+    if partial.messages < MIN_MESSAGES:
+        raise ChatExportError('Chat file mein bahut kam messages hain ya format galat hai.')
+
+    if analysis is not None and partial.messages == analysis.msg_count:
+        return analysis, 'Is chat mein koi naye messages nahi hain - purana analysis dikha rahe hain.'
+
+    note = None
+    if analysis is None:
+        analysis = Analysis(
+            user_id      = user_id,
+            chat_name    = chat_name,
+            file_deleted = True
+        )
+        db.session.add(analysis)
+    else:
+        # Same chat, more messages: update the existing analysis in place;
+        # slides drawn from the old stats go (new ones are made on request)
+        note = 'Chat update ho gaya - sirf naye messages analyze kiye.'
+        image_storage.delete_sets(analysis.images)
+
+    store_results(analysis, stats_from_partial(partial))
+    save_checkpoint(analysis, partial)
+    db.session.commit()
+    results_cache.invalidate(analysis.id)
+    refresh_summary(user_id)
+    upload_cache.store(content_hash, analysis)
+    return analysis, note
@@ -0,0 +1,124 @@
+"""
+Per-worker cache behind login_manager.user_loader.
+
+Flask-Login loads the session's user on every authenticated request.
+This keeps a snapshot of each recent user's columns for a few seconds
+(USER_CACHE_TTL) in a bounded LRU and, on a hit, rebuilds a User that is
+attached to the request's session as if just loaded - so routes can
+still change and commit current_user - without a query.
+
+Routes that change a user invalidate them right after committing. That
+also appends a byte to a stamp file shared by the workers (next to the
+database); every lookup stats it - one syscall, no query - and a worker
+that sees it changed drops its whole cache, so a payment or password
+change made in one worker is seen by the next request in any other.
+The TTL only bounds how long an idle entry lingers.
+"""
+import os, threading, time
+from collections import OrderedDict
+from sqlalchemy.orm import make_transient_to_detached
+from database.models import User, db
+
+USER_CACHE_TTL  = float(os.environ.get('USER_CACHE_TTL', 30))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', 1024))
+
+_COLUMNS = tuple(c.key for c in User.__table__.columns)
+
+class UserCache:
+    def __init__(self, capacity=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, stamp_path=None):
+        self.capacity   = capacity
+        self.ttl        = ttl
+        self.stamp_path = stamp_path        # shared across workers; None = this process only
+        self.hits       = 0
+        self.misses     = 0
+        self.flushes    = 0
+        self._stamp     = None
+        self._entries   = OrderedDict()     # user id -> (expires at, column values)
+        self._lock      = threading.Lock()
+
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            st = os.stat(self.stamp_path)
+        except OSError:             # nobody has invalidated anything yet
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _check_stamp(self):
+        # Some worker changed a user since we last looked: start over
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            if self._entries:
+                self._entries.clear()
+                self.flushes += 1
+            self._stamp = stamp
+
+    def get(self, user_id):
+        with self._lock:
+            self._check_stamp()
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, user, stamp):
+        """Cache user as loaded when the stamp file read stamp (from stamp())"""
+        if self.capacity <= 0:
+            return
+        values = {name: getattr(user, name) for name in _COLUMNS}
+        with self._lock:
+            if stamp != self._stamp:        # a change landed while we loaded it
+                return
+            self._entries[user.id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def stamp(self):
+        with self._lock:
+            self._check_stamp()
+            return self._stamp
+
+    def invalidate(self, *user_ids):
+        """Drop users here and tell the other workers (call after committing)"""
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+            if self.stamp_path:
+                with open(self.stamp_path, 'ab') as f:
+                    f.write(b'.')
+
+    def info(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0, 'flushes': self.flushes,
+                    'size': len(self._entries), 'capacity': self.capacity, 'ttl': self.ttl}
+
+user_cache = UserCache()
+
+def configure_user_cache(stamp_path):
+    """Share invalidations between workers through stamp_path (called once at startup)"""
+    user_cache.stamp_path = stamp_path
+    return user_cache
+
+def load_cached_user(user_id):
+    """User for the session's id: from the cache if fresh, else one query"""
+    values = user_cache.get(user_id)
+    if values is None:
+        stamp = user_cache.stamp()
+        user  = db.session.get(User, user_id)
+        if user is not None:
+            user_cache.put(user, stamp)
+        return user
+    user = db.session.identity_map.get(db.session.identity_key(User, user_id))
+    if user is None:
+        # Persistent without a SELECT: changes to it flush as usual
+        user = User(**values)
+        make_transient_to_detached(user)
+        db.session.add(user)
+    return user
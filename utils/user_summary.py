@@ -0,0 +1,69 @@
+"""
+Per-user dashboard summary: analysis count, latest analysis and the
+newest few with their headline numbers, in one user_summaries row.
+
+It is rebuilt whenever a user's analyses change (upload, update, delete)
+from an index-only count plus the newest rows - reading just the header
+bytes of their results blobs - so the dashboard itself is a single
+primary-key read that never loads the stats.
+"""
+import json
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert
+from database.models import Analysis, UserSummary, db
+from utils.results_codec import HEADLINE_SIZE, decode_headline, load_headline
+
+RECENT_ANALYSES = 3
+
+def _recent(user_id):
+    rows = (db.session.query(Analysis.id, Analysis.chat_name, Analysis.created_at,
+                             db.func.substr(Analysis.results_blob, 1, HEADLINE_SIZE))
+            .filter(Analysis.user_id == user_id)
+            .order_by(Analysis.created_at.desc())
+            .limit(RECENT_ANALYSES)
+            .all())
+    recent = []
+    for analysis_id, chat_name, created_at, header in rows:
+        # Legacy row without a blob yet: load_headline converts it
+        headline = decode_headline(header) if header else load_headline(db.session.get(Analysis, analysis_id))
+        recent.append({
+            'id':             analysis_id,
+            'chat_name':      chat_name,
+            'created_at':     created_at.isoformat(),
+            'total_messages': headline['total_messages'],
+        })
+    return recent
+
+def refresh_summary(user_id):
+    """Rebuild a user's summary from their analyses; returns it"""
+    if user_id is None:
+        return None
+    count  = db.session.query(db.func.count(Analysis.id)).filter(Analysis.user_id == user_id).scalar()
+    recent = _recent(user_id)
+    values = {
+        'analyses_count': count,
+        'latest_id':      recent[0]['id'] if recent else None,
+        'latest_at':      datetime.fromisoformat(recent[0]['created_at']) if recent else None,
+        'recent_json':    json.dumps(recent),
+        'updated_at':     datetime.utcnow(),
+    }
+    # Upsert: two workers may refresh the same user at once
+    db.session.execute(insert(UserSummary)
+                       .values(user_id=user_id, **values)
+                       .on_conflict_do_update(index_elements=['user_id'], set_=values))
+    db.session.commit()
+    return db.session.get(UserSummary, user_id, populate_existing=True)
+
+def get_summary(user_id):
+    """The user's summary, built on first use"""
+    return db.session.get(UserSummary, user_id) or refresh_summary(user_id)
+
+def recent_analyses(summary):
+    """The summary's newest analyses, created_at as datetime"""
+    recent = json.loads(summary.recent_json or '[]')
+    for item in recent:
+        item['created_at'] = datetime.fromisoformat(item['created_at'])
+    return recent
+
+def delete_summary(user_id):
+    UserSummary.query.filter_by(user_id=user_id).delete()
@@ -1,73 +1,245 @@
-import re
-from datetime import datetime
+import os, re
+from datetime import date
+from functools import lru_cache
+from itertools import chain
 import emoji as emoji_lib
+from utils.message_table import MessageTable
+from utils.system_messages import DEFAULT_CLASSIFIER
+from utils.tokenizer import WORD_RE
 
-def parse_whatsapp_chat(file_path):
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+EMOJI_DATA     = emoji_lib.EMOJI_DATA
+
+# Android format: "12/01/2024, 10:30 PM - Name: message"
+ANDROID_PATTERN = re.compile(
+    r'(\d{1,2}/\d{1,2}/\d{2,4}),\s(\d{1,2}:\d{2}\s?[AP]M)\s-\s([^:]+):\s(.*)')
+
+# iPhone format: "[12/01/24, 10:30:15 PM] Name: message"
+IPHONE_PATTERN  = re.compile(
+    r'\[(\d{1,2}/\d{1,2}/\d{2,4}),\s(\d{1,2}:\d{2}:\d{2}\s?[AP]M)\]\s([^:]+):\s(.*)')
+
+CHAT_FORMATS = {'android': ANDROID_PATTERN, 'iphone': IPHONE_PATTERN}
+
+# Lines looked at before picking a format for the whole file
+FORMAT_SAMPLE_LINES = 200
+
+# Throughput target for the parser engine on a single core (see benchmarks/)
+TARGET_MSGS_PER_SEC = 200_000
+
+def detect_chat_format(sample_lines):
     """
-    Parse WhatsApp exported .txt file.
-    Handles BOTH Android and iPhone export formats.
-    Returns: list of dicts [{datetime, sender, text}, ...]
+    Pick the export format from a sample of lines.
+    Returns: (format_name, dayfirst) or (None, False) if nothing matched
     """
-    messages = []       # Android format: "12/01/2024, 10:30 PM - Name: message"
-    android_pattern = r'(\d{1,2}/\d{1,2}/\d{2,4}),\s(\d{1,2}:\d{2}\s?[AP]M)\s-\s([^:]+):\s(.*)'
-    
-    # iPhone format: "[12/01/24, 10:30:15 PM] Name: message"
-    iphone_pattern  = r'\[(\d{1,2}/\d{1,2}/\d{2,4}),\s(\d{1,2}:\d{2}:\d{2}\s?[AP]M)\]\s([^:]+):\s(.*)'
-    
-    skip_phrases = [
-        'Messages and calls are end-to-end encrypted',
-        'changed their phone number',
-        'added you',
-        'left',
-        'created group',
-        '<Media omitted>',
-        'null',
-        'image omitted',
-        'video omitted',
-        'audio omitted',
-        'sticker omitted',
-    ]
-    
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Skip system messages
-            if any(skip in line for skip in skip_phrases):
-                continue
-            
-            # Try Android format first
-            match = re.match(android_pattern, line)
-            fmt   = '%m/%d/%Y %I:%M %p'
-            
-            if not match:
-                match = re.match(iphone_pattern, line)
-                fmt   = '%m/%d/%y %I:%M:%S %p'
-            
+    hits     = dict.fromkeys(CHAT_FORMATS, 0)
+    dayfirst = False
+    for line in sample_lines:
+        for name, pattern in CHAT_FORMATS.items():
+            match = pattern.match(line)
             if match:
-                date_str, time_str, sender, text = match.groups()
-                try:
-                    dt = datetime.strptime(f'{date_str} {time_str}', fmt)
-                    messages.append({
-                        'datetime': dt,
-                        'sender':   sender.strip(),
-                        'text':     text.strip()
-                    })
-                except Exception:
-                    continue
-    
+                hits[name] += 1
+                first, second = match.group(1).split('/')[:2]
+                if int(first) > 12 and int(second) <= 12:
+                    dayfirst = True
+                break
+    best = max(hits, key=hits.get)
+    return (best, dayfirst) if hits[best] else (None, False)
+
+class TimestampDecoder:
+    """
+    Turns WhatsApp date/time strings into epoch seconds without strptime.
+    Date and time strings repeat a lot in a chat, so each distinct string is
+    decoded once and cached; a timestamp is then just the sum of two ints.
+    """
+    def __init__(self, dayfirst=False):
+        self.dayfirst = dayfirst
+        self._dates   = {}
+        self._times   = {}
+
+    def decode_date(self, date_str):
+        """Date string -> epoch seconds at midnight, None if invalid"""
+        try:
+            return self._dates[date_str]
+        except KeyError:
+            pass
+        first, second, year = date_str.split('/')
+        month, day = (int(second), int(first)) if self.dayfirst else (int(first), int(second))
+        year = int(year)
+        if year < 100:                  # same pivot as strptime's %y
+            year += 2000 if year < 69 else 1900
+        try:
+            secs = (date(year, month, day).toordinal() - _EPOCH_ORDINAL) * 86400
+        except ValueError:
+            secs = None
+        self._dates[date_str] = secs
+        return secs
+
+    def decode_time(self, time_str):
+        """Time string -> seconds since midnight, None if invalid"""
+        try:
+            return self._times[time_str]
+        except KeyError:
+            pass
+        clock, meridiem = time_str[:-2].rstrip(), time_str[-2:]
+        fields = [int(f) for f in clock.split(':')]
+        hour, minute = fields[0], fields[1]
+        second = fields[2] if len(fields) > 2 else 0
+        if 1 <= hour <= 12 and minute < 60 and second < 60:
+            hour = hour % 12 + (12 if meridiem == 'PM' else 0)
+            secs = hour * 3600 + minute * 60 + second
+        else:
+            secs = None
+        self._times[time_str] = secs
+        return secs
+
+    def decode(self, date_str, time_str):
+        day_secs  = self.decode_date(date_str)
+        time_secs = self.decode_time(time_str)
+        if day_secs is None or time_secs is None:
+            return None
+        return day_secs + time_secs
+
+def _match_any_format(line):
+    # Fallback when no line in the sample looked like a message
+    for pattern in CHAT_FORMATS.values():
+        match = pattern.match(line)
+        if match:
+            return match
+    return None
+
+def _sample_lines(lines):
+    # First non-empty stripped lines, for format detection
+    sample = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            sample.append(line)
+            if len(sample) >= FORMAT_SAMPLE_LINES:
+                break
+    return sample
+
+def detect_lines_format(lines):
+    """detect_chat_format() over the leading lines of a list of raw lines"""
+    return detect_chat_format(_sample_lines(lines))
+
+def _parse_lines(lines, classifier=DEFAULT_CLASSIFIER, chat_format=None):
+    lines  = iter(lines)
+    sample = _sample_lines(lines) if chat_format is None else []
+    fmt, dayfirst = chat_format or detect_chat_format(sample)
+    match_line = CHAT_FORMATS[fmt].match if fmt else _match_any_format
+    decode     = TimestampDecoder(dayfirst).decode
+    classify   = classifier.classify
+    messages   = MessageTable()
+    append     = messages.append
+    skipped    = messages.skipped
+    for line in chain(sample, lines):
+        line = line.strip()
+        if not line:
+            continue
+        match = match_line(line)
+        if match:
+            date_str, time_str, sender, text = match.groups()
+            text = text.strip()
+            # Skip system, media and deleted messages (looks at the body only)
+            kind = classify(text)
+            if kind:
+                skipped[kind] += 1
+                continue
+            ts = decode(date_str, time_str)
+            if ts is not None:
+                append(ts, sender.strip(), text)
     return messages
 
+def iter_chat_lines(source):
+    """
+    Yield text lines from a chat source, one at a time:
+    a file path, a werkzeug FileStorage, a text or binary file object,
+    or any iterable of str/bytes lines. Nothing is read ahead or spooled.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'r', encoding='utf-8-sig', errors='ignore') as f:
+            yield from f
+        return
+    source = getattr(source, 'stream', source)      # werkzeug FileStorage
+    first  = True
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='ignore')
+        if first:
+            line  = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+def parse_whatsapp_chat(source, classifier=DEFAULT_CLASSIFIER, chat_format=None):
+    """
+    Parse WhatsApp exported chat in one streaming pass.
+    source: file path, uploaded FileStorage/stream, or iterable of lines.
+    classifier: MessageClassifier deciding which bodies are system/media/deleted.
+    Handles BOTH Android and iPhone export formats; the format is picked
+    once from the first lines of the file, unless chat_format - a
+    (format_name, dayfirst) pair from detect_chat_format() - is given, as it
+    is for every slice of a chat split across workers.
+    Returns: MessageTable (iterates as [{datetime, sender, text}, ...])
+    """
+    return _parse_lines(iter_chat_lines(source), classifier, chat_format)
+
+@lru_cache(maxsize=None)
+def _emoji_index():
+    """
+    Character trie over every key of emoji.EMOJI_DATA, and a compiled regex
+    for runs of characters that can be part of an emoji. Runs are found in C,
+    so Python only looks at the (short, rare) runs themselves.
+    """
+    trie = {}
+    for key in emoji_lib.EMOJI_DATA:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[''] = True
+    # Apart from keycap digits, (c), (R) and ZWJ, every emoji character sits
+    # above U+2030. Non-emoji characters up there are dropped by the trie walk.
+    low  = sorted({ch for key in emoji_lib.EMOJI_DATA for ch in key if ch < '\u2030'})
+    high = min(ch for key in emoji_lib.EMOJI_DATA for ch in key if ch >= '\u2030')
+    runs = re.compile('[' + ''.join(map(re.escape, low)) + re.escape(high) + '-\U0010ffff]+')
+    return trie, runs.findall
+
+def _split_run(run, trie, out):
+    # Longest-match walk of the trie along a run of emoji-ish characters
+    pos, n = 0, len(run)
+    while pos < n:
+        node, i, end = trie, pos, None
+        while i < n:
+            node = node.get(run[i])
+            if node is None:
+                break
+            i += 1
+            if '' in node:
+                end = i
+        if end is None:
+            pos += 1
+        else:
+            out.append(run[pos:end])
+            pos = end
+
 def extract_emojis(text):
-    """Extract list of all emojis from text"""
-    return [c for c in text if c in emoji_lib.EMOJI_DATA]
+    """
+    Extract list of all emojis from text. Whole sequences (ZWJ families,
+    skin tones, flags, keycaps) come back as one item, longest match first.
+    """
+    if text.isascii():          # no emoji is pure ASCII
+        return []
+    trie, find_runs = _emoji_index()
+    emojis = []
+    for run in find_runs(text):
+        if run in EMOJI_DATA:   # the common case: the run is exactly one emoji
+            emojis.append(run)
+        else:
+            _split_run(run, trie, emojis)
+    return emojis
 
 def extract_words(text):
     """Extract clean word list from text"""
-    text = re.sub(r'[^a-zA-Z\u0900-\u097F\s]', ' ', text)
-    return [w.lower() for w in text.split() if len(w) > 1]
+    return [w for w in WORD_RE.findall(text.lower()) if len(w) > 1]
 
 def calculate_response_time(dt1, dt2):
     """Return seconds between two datetime objects"""